@@ -1,116 +1,489 @@
-from typing import Any
-from json import JSONDecodeError
+import time
+from asyncio import Event, Future, get_running_loop
+from collections import deque
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Literal
+from collections.abc import Callable
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from anyio import create_task_group, move_on_after
+from anyio import create_task_group, move_on_after, sleep, CancelScope, CapacityLimiter
+from pydantic import BaseModel, ValidationError
 from loguru import logger
-from pydantic import ValidationError
-# from app.core.config import get_settings, Settings
-from app.schemas.qq import WsMessageModel, PrivateMessage, ConnectEvent
-from app.schemas import OneBotResponse
-from app.core.event_manager import publish, register
+from app.core.config import get_settings
+from app.schemas.qq import WsMessage, WsMessageModel, PrivateMessage, ConnectEvent, MetaEventBase, HeartbeatEvent
+from app.schemas import OneBotResponse, WsFrameModel
+from app.core.event_manager import publish, register, has_handlers
+from app.core.hotlog import get_hot_logger
+from app.core import cluster
 
 router = APIRouter(prefix='/ws')
+log = get_hot_logger(__name__)
+
+async def receive_frame(websocket: WebSocket) -> str | bytes:
+    """接收一帧原始的文本或二进制数据，交给 pydantic 直接从 json 校验，不经过中间的 dict"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes") or b""
+
+Liveness = Literal['alive', 'suspect', 'dead']
+
+@dataclass
+class ConnectionHealth:
+    """由元事件直接维护的连接健康状态"""
+    connected_at: float = field(default_factory=time.monotonic)
+    # 最近一次收到元事件的时间（time.monotonic）
+    last_seen: float = field(default_factory=time.monotonic)
+    online: bool | None = None
+    good: bool | None = None
+    # 心跳间隔（毫秒），收到第一个心跳前为 None
+    interval: int | None = None
+    heartbeats: int = 0
+    # 按错过的心跳数判定的存活状态，见 ConnectionManager.watch
+    state: Liveness = 'alive'
+
+    def missed_heartbeats(self, now: float) -> float:
+        """距上次收到元事件已错过的心跳数，尚不知道心跳间隔时为 0"""
+        if not self.interval:
+            return 0.0
+        return (now - self.last_seen) / (self.interval / 1000)
+
+@dataclass
+class SendStats:
+    """连接的发送统计，延迟指从入队到写入 socket 的时间（秒）"""
+    frames: int = 0
+    # 写出次数，每次写出连续发送当时已就绪的全部帧
+    batches: int = 0
+    # 因超过高水位被拒绝的帧数
+    rejected: int = 0
+    # 连接断开时尚未写出而丢弃的帧数
+    dropped: int = 0
+    avg_latency: float = 0.0
+    max_latency: float = 0.0
+    # 写出的字节数与发送队列的最大长度
+    bytes: int = 0
+    peak_outbox: int = 0
+
+    def record(self, latency: float, size: int):
+        self.frames += 1
+        self.bytes += size
+        # 指数滑动平均，对近期的排队情况更敏感
+        self.avg_latency += (latency - self.avg_latency) * 0.1
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+class BotConnection:
+    """
+    一个 bot 的 ws 连接及其发送队列
+
+    所有发送方只把帧放入队列，由该连接唯一的写协程（run_writer）写入 socket，
+    避免多个协程同时写同一个连接，也让调用方不必等待每一帧的 socket I/O。
+    """
+
+    def __init__(self, bot_id: int, websocket: WebSocket, high_water: int = 0):
+        self.bot_id = bot_id
+        self.websocket = websocket
+        self.high_water = high_water
+        # (帧, 入队时间, 写出后通知的 future)
+        self.outbox: deque[tuple[str, float, Future[bool] | None]] = deque()
+        self.stats = SendStats()
+        # 收到的帧数与字节数
+        self.received_frames = 0
+        self.received_bytes = 0
+        self.closed = False
+        self._wakeup = Event()
+
+    def enqueue(self, message: str, written: Future[bool] | None = None) -> bool:
+        """放入发送队列，连接已关闭或队列达到高水位时返回 False；written 在写出（True）或丢弃（False）时完成"""
+        if self.closed:
+            return False
+        if self.high_water and len(self.outbox) >= self.high_water:
+            self.stats.rejected += 1
+            log.warning("Outbox of bot({}) is full, message rejected.", self.bot_id, sample=5.0, bot_id=self.bot_id)
+            return False
+        self.outbox.append((message, time.monotonic(), written))
+        if len(self.outbox) > self.stats.peak_outbox:
+            self.stats.peak_outbox = len(self.outbox)
+        self._wakeup.set()
+        return True
+
+    async def send(self, message: str) -> bool:
+        """放入发送队列并等待实际写出，返回是否写出成功"""
+        written: Future[bool] = get_running_loop().create_future()
+        if not self.enqueue(message, written):
+            return False
+        return await written
+
+    async def run_writer(self):
+        """写协程：每次取出队列中已就绪的全部帧连续写出，socket 出错或连接关闭时结束"""
+        while not self.closed:
+            if not self.outbox:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            batch = 0
+            # 每次取帧前都重新检查：写出时会让出控制权，期间连接可能被关闭或被新连接接管
+            while self.outbox and not self.closed:
+                message, enqueued_at, written = self.outbox.popleft()
+                try:
+                    await self.websocket.send_text(message)
+                except (WebSocketDisconnect, OSError, RuntimeError):
+                    log.error("Sending failed. Bot({}) has been inactive.", self.bot_id, bot_id=self.bot_id)
+                    _resolve(written, False)
+                    self.close()
+                    return
+                self.stats.record(time.monotonic() - enqueued_at, len(message))
+                _resolve(written, True)
+                batch += 1
+            self.stats.batches += 1
+            log.debug("Sent {} messages to bot({}).", batch, self.bot_id, bot_id=self.bot_id)
+
+    def withdraw(self, written: Future[bool]) -> bool:
+        """撤回仍在发送队列中的帧；帧已被写协程取出（正在或已经写出）时返回 False"""
+        for index, (_, _, entry) in enumerate(self.outbox):
+            if entry is written:
+                del self.outbox[index]
+                _resolve(written, False)
+                return True
+        return False
+
+    def _detach_outbox(self) -> deque[tuple[str, float, Future[bool] | None]]:
+        """换上一个空队列并返回原队列；不在原地清空，写协程持有的帧不受影响"""
+        outbox, self.outbox = self.outbox, deque()
+        return outbox
+
+    def take_over(self, old: 'BotConnection') -> int:
+        """接管同一 bot 旧连接上尚未写出的帧（这些请求对端还没收到，可以安全地改由新连接发出），返回接管的帧数"""
+        old.closed = True
+        old._wakeup.set()
+        frames = old._detach_outbox()
+        self.outbox.extend(frames)
+        if frames:
+            self._wakeup.set()
+        return len(frames)
+
+    def close(self):
+        """停止接受新的帧，丢弃尚未写出的帧"""
+        self.closed = True
+        # 唤醒写协程使其退出
+        self._wakeup.set()
+        dropped = self._detach_outbox()
+        self.stats.dropped += len(dropped)
+        for _, _, written in dropped:
+            _resolve(written, False)
+
+def _resolve(written: Future[bool] | None, ok: bool):
+    if written is not None and not written.done():
+        written.set_result(ok)
+
+@dataclass
+class AdmissionStats:
+    accepted: int = 0
+    # 因连接数达到上限 / 同时握手数达到上限被拒绝的连接
+    rejected_full: int = 0
+    rejected_handshakes: int = 0
+    # 握手超时或首帧无效的连接
+    failed_handshakes: int = 0
+    # bot 重连时被替换掉的旧连接
+    replaced: int = 0
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: dict[int, WebSocket] = {}
+        self.active_connections: dict[int, BotConnection] = {}
+        self.health: dict[int, ConnectionHealth] = {}
+        # 正在握手（已接受、尚未收到首个事件）的连接数
+        self.handshaking = 0
+        self.admission = AdmissionStats()
+        # bot 连上 / 连接被移除（断开或判定失活）时的回调，参数为 bot_id
+        self.connect_listeners: list[Callable[[int], None]] = []
+        self.disconnect_listeners: list[Callable[[int], None]] = []
+        # 因心跳超时被驱逐的连接数
+        self.evicted = 0
+
+    def record_meta_event(self, bot_id: int, e: MetaEventBase):
+        """将元事件直接记入健康表，不经过事件总线"""
+        health = self.health.get(bot_id)
+        if health is None:
+            health = self.health[bot_id] = ConnectionHealth()
+        health.last_seen = time.monotonic()
+        if health.state == 'suspect':
+            logger.info(f"Bot({bot_id}) is alive again.")
+        health.state = 'alive'
+        if isinstance(e, HeartbeatEvent):
+            health.online = e.status.online
+            health.good = e.status.good
+            health.interval = e.interval
+            health.heartbeats += 1
 
-    async def connect(self, websocket: WebSocket) -> None | int:
+    async def connect(self, websocket: WebSocket) -> tuple[BotConnection, WsMessage] | None:
+        """
+        准入检查并完成握手，登记连接，返回连接与首个（通常是 connect 生命周期）事件
+
+        连接数或同时握手数达到上限时直接拒绝（1013，稍后重试），让重连风暴中的请求尽快失败，
+        而不是在服务端堆积 socket。同一 bot 重连时替换旧连接，不占用新的连接名额
+        （按 OneBot 的 X-Self-ID 请求头识别，握手后再核对 connect 事件）。
+        """
+        settings = get_settings()
+        replacing = self._claimed_bot_id(websocket) in self.active_connections
+        if (
+            not replacing and settings.ws_max_connections
+            and len(self.active_connections) + self.handshaking >= settings.ws_max_connections
+        ):
+            self.admission.rejected_full += 1
+            log.warning("Rejecting ws connection: {} connections reached.", settings.ws_max_connections, sample=5.0)
+            await self._reject(websocket)
+            return
+        if settings.ws_max_handshakes and self.handshaking >= settings.ws_max_handshakes:
+            self.admission.rejected_handshakes += 1
+            log.warning("Rejecting ws connection: {} handshakes in progress.", self.handshaking, sample=5.0)
+            await self._reject(websocket)
+            return
+        self.handshaking += 1
+        try:
+            connect_event = await self._handshake(websocket, settings.ws_handshake_timeout)
+        finally:
+            self.handshaking -= 1
+        if connect_event is None:
+            self.admission.failed_handshakes += 1
+            await self._close_socket(websocket, 1000)
+            return
+        bot_id = connect_event.self_id
+        if (
+            replacing and bot_id not in self.active_connections and settings.ws_max_connections
+            and len(self.active_connections) >= settings.ws_max_connections
+        ):
+            # 请求头声称的 bot 与 connect 事件不符，不能借此绕过连接数上限
+            self.admission.rejected_full += 1
+            log.warning("Rejecting ws connection: {} connections reached.", settings.ws_max_connections, sample=5.0)
+            await self._close_socket(websocket, 1013)
+            return
+        connection = BotConnection(bot_id, websocket, settings.ws_outbox_high_water)
+        if old := self.active_connections.get(bot_id):
+            self.admission.replaced += 1
+            moved = connection.take_over(old)
+            logger.warning(f"Bot({bot_id}) reconnected, replacing the old connection ({moved} unsent frames moved).")
+            await self._close(old)
+        else:
+            logger.info(f"A new bot({bot_id}) connected!")
+        self.admission.accepted += 1
+        self.active_connections[bot_id] = connection
+        self.health[bot_id] = ConnectionHealth()
+        cluster.claim_bot(bot_id)
+        for listener in self.connect_listeners:
+            listener(bot_id)
+        return connection, connect_event
+
+    @staticmethod
+    def _claimed_bot_id(websocket: WebSocket) -> int | None:
+        try:
+            return int(websocket.headers.get('x-self-id', ''))
+        except ValueError:
+            return None
+
+    async def _reject(self, websocket: WebSocket):
+        # 在 accept 之前关闭会被服务器转成 HTTP 403，客户端收不到 1013，只能当作鉴权失败
+        try:
+            await websocket.accept()
+        except Exception:
+            return
+        await self._close_socket(websocket, 1013)
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _handshake(self, websocket: WebSocket, timeout: float) -> WsMessage | None:
         logger.debug("Receiving a new ws connection...")
         await websocket.accept()
-        connect_event_data: dict[str, Any] | None = None
+        frame: str | bytes | None = None
         try:
             logger.debug("Waiting for the connect meta event message...")
-            async with create_task_group():
-                with move_on_after(1) as scope:
-                    connect_event_data = await websocket.receive_json()
-                if(scope.cancelled_caught):
-                    logger.warning("New Ws Connection Timeout after 1 sec no initial message!")
-                    return
-        except JSONDecodeError:
-            logger.warning("The new ws connection sending non-json initial message...")
-            await websocket.close()
-            return
+            with move_on_after(timeout):
+                frame = await receive_frame(websocket)
+            if frame is None:
+                logger.warning(f"New Ws Connection Timeout after {timeout} sec no initial message!")
+                return
         except WebSocketDisconnect:
             logger.warning("The new ws connection closed by client before handshake.")
             return
         try:
-            connect_event = WsMessageModel.validate_python(connect_event_data)
+            connect_event = WsMessageModel.validate_json(frame)
         except ValidationError:
-            logger.warning("The new ws connection sent a json initial message, but not a WsMessage.")
-            await websocket.close()
+            logger.warning("The new ws connection sent an initial message, but not a WsMessage.")
             return
         if not isinstance(connect_event, ConnectEvent):
             logger.warning("The new ws connection sent first WsMessage, but not a ConnectEvent Message.")
-        bot_id = connect_event.self_id
-        logger.info(f"A new bot({bot_id}) connected!")
-        self.active_connections[bot_id] = websocket
-        return bot_id
+        return connect_event
 
-    async def disconnect(self, bot_id: int):
-        if ws:=self.active_connections.pop(bot_id, None):
+    async def _close(self, connection: BotConnection):
+        connection.close()
+        try:
+            await connection.websocket.close()
+        except Exception:
+            pass
+
+    async def disconnect(self, bot_id: int, connection: BotConnection | None = None):
+        """移除 bot 的连接；指定 connection 时，只有它仍是该 bot 的当前连接才移除（已被重连替换时不动新连接）"""
+        current = self.active_connections.get(bot_id)
+        if connection is not None and current is not connection:
+            await self._close(connection)
+            return
+        self.health.pop(bot_id, None)
+        cluster.release_bot(bot_id)
+        if current is not None:
+            del self.active_connections[bot_id]
+            await self._close(current)
             logger.info(f"Bot({bot_id}) disconnect successfully!")
-            try:
-                await ws.close()
-            except:
-                pass
+            for listener in self.disconnect_listeners:
+                listener(bot_id)
         else:
             logger.warning(f"Bot({bot_id}) already removed!")
 
-    async def send_message(self, bot_id: int, message: str):
-        if bot_id in self.active_connections:
-            websocket = self.active_connections[bot_id]
-            logger.info(f"Sending message to bot({bot_id})...")
-            try:
-                await websocket.send_text(message)
-            except WebSocketDisconnect:
-                logger.error(f"Sending failed. Bot({bot_id}) has been inactive.")
-                await self.disconnect(bot_id)
-                return False
-            logger.info(f"Sending successfully!")
-            return True
-        else:
-            logger.error(f"Sending fail to a non-exist bot({bot_id}).")
-            return False
-            
+    def is_suspect(self, bot_id: int) -> bool:
+        health = self.health.get(bot_id)
+        return health is not None and health.state != 'alive'
+
+    async def watch(self, connection: BotConnection):
+        """
+        心跳看门狗：按心跳间隔检查错过的心跳数，超过 heartbeat_suspect_misses 标记为可疑（路由时避开），
+        超过 heartbeat_dead_misses 判定失活，关闭连接后返回。半开的 socket 由此及时被驱逐，
+        而不是让发往它的请求各自等到超时。
+        """
+        settings = get_settings()
+        bot_id = connection.bot_id
+        while not connection.closed:
+            health = self.health.get(bot_id)
+            if health is None or not health.interval:
+                await sleep(settings.heartbeat_check_interval)
+                continue
+            missed = health.missed_heartbeats(time.monotonic())
+            if missed >= settings.heartbeat_dead_misses:
+                health.state = 'dead'
+                self.evicted += 1
+                logger.warning(f"Bot({bot_id}) missed {missed:.1f} heartbeats, evicting the connection.")
+                connection.close()
+                return
+            if missed >= settings.heartbeat_suspect_misses and health.state == 'alive':
+                health.state = 'suspect'
+                logger.warning(f"Bot({bot_id}) missed {missed:.1f} heartbeats, marked as suspect.")
+            # 在下一个心跳应到达的时间之后再检查
+            await sleep(min(health.interval / 1000 / 2, settings.heartbeat_check_interval))
+
+    def send_stats(self, bot_id: int) -> SendStats | None:
+        if connection := self.active_connections.get(bot_id):
+            return connection.stats
+        return None
 
-    async def broadcast(self, message: str):
-        logger.info("Broadcasting message...")
-        result = True
-        for bot_id in tuple(self.active_connections.keys()):
-            result = result and await self.send_message(bot_id, message)
+    async def send_message(self, bot_id: int, message: str, written: Future[bool] | None = None) -> bool:
+        """放入 bot 连接的发送队列，不等待实际写出；written 在写出（True）或丢弃（False）时完成"""
+        if connection := self.active_connections.get(bot_id):
+            return connection.enqueue(message, written)
+        log.error("Sending fail to a non-exist bot({}).", bot_id, sample=5.0, bot_id=bot_id)
+        return False
+
+    async def send_messages(self, bot_id: int, messages: Sequence[str]) -> int:
+        """将多帧依次放入同一个 bot 连接的发送队列，返回成功入队的帧数"""
+        connection = self.active_connections.get(bot_id)
+        if connection is None:
+            log.error("Sending fail to a non-exist bot({}).", bot_id, sample=5.0, bot_id=bot_id)
+            return 0
+        for sent, message in enumerate(messages):
+            if not connection.enqueue(message):
+                return sent
+        return len(messages)
+
+    async def broadcast(self, message: str | BaseModel, timeout: float = 5.0, concurrency: int = 64) -> dict[int, bool | None]:
+        """
+        向所有连接并发发送同一帧，返回每个 bot 的结果：True 已写出，False 未发出，
+        None 表示超时时帧正在写入 socket、是否送达未知
+
+        消息只序列化一次；同时等待写出的连接数不超过 concurrency，总耗时取决于最慢的连接。
+        超时仍在发送队列里的帧会被撤回，不会在之后悄悄发出。
+        """
+        frame = message.model_dump_json() if isinstance(message, BaseModel) else message
+        connections = tuple(self.active_connections.items())
+        logger.info(f"Broadcasting message to {len(connections)} bots...")
+        results: dict[int, bool | None] = {bot_id: False for bot_id, _ in connections}
+        limiter = CapacityLimiter(max(concurrency, 1))
+
+        async def send(bot_id: int, connection: BotConnection):
+            async with limiter:
+                written: Future[bool] = get_running_loop().create_future()
+                if not connection.enqueue(frame, written):
+                    return
+                with move_on_after(timeout):
+                    results[bot_id] = await written
+                    return
+                if not connection.withdraw(written):
+                    results[bot_id] = None
+
+        async with create_task_group() as tg:
+            for bot_id, connection in connections:
+                tg.start_soon(send, bot_id, connection)
+        failed = [bot_id for bot_id, ok in results.items() if ok is False]
+        if failed:
+            logger.warning(f"Broadcast failed for bots {failed}.")
+        if unconfirmed := [bot_id for bot_id, ok in results.items() if ok is None]:
+            logger.warning(f"Broadcast unconfirmed for bots {unconfirmed}.")
         logger.info("Broadcast done.")
-        return result
-    
+        return results
+
 manager = ConnectionManager()
 
 @router.websocket('/')
 async def ws_endpoint(websocket: WebSocket):
-    bot_id = await manager.connect(websocket)
-    if not bot_id:
+    connected = await manager.connect(websocket)
+    if connected is None:
         return
-    try:
-        while True:
-            try:
-                data = await websocket.receive_json()
-            except JSONDecodeError:
-                logger.warning("Receiving non-json ws message.")
-                continue
-            logger.debug(data)
-            if 'echo' in data:
-                event = OneBotResponse.model_validate(data)
-            elif 'post_type' in data:
-                try:
-                    event = WsMessageModel.validate_python(data)
-                except ValidationError:
-                    logger.warning(f"不支持的消息类型：{data}")
-                    continue
-            else:
-                logger.warning("Receiving non-protocol ws message.")
+    connection, first_event = connected
+    bot_id = connection.bot_id
+    async with create_task_group() as tg:
+        tg.start_soon(_run_writer, connection, tg.cancel_scope)
+        tg.start_soon(_run_watchdog, connection, tg.cancel_scope)
+        try:
+            # 握手时的 connect 事件同样交给订阅者（如按连接失效的缓存）
+            if has_handlers(type(first_event)):
+                await publish(first_event)
+            await _read_loop(connection)
+        except WebSocketDisconnect:
+            pass
+        tg.cancel_scope.cancel()
+    await manager.disconnect(bot_id, connection)
+
+async def _run_writer(connection: BotConnection, scope: CancelScope):
+    await connection.run_writer()
+    # 写出失败说明连接已不可用，一并结束读取
+    scope.cancel()
+
+async def _run_watchdog(connection: BotConnection, scope: CancelScope):
+    await manager.watch(connection)
+    # 判定失活后结束读取，连接随之被移除
+    scope.cancel()
+
+async def _read_loop(connection: BotConnection):
+    websocket, bot_id = connection.websocket, connection.bot_id
+    while True:
+        frame = await receive_frame(websocket)
+        connection.received_frames += 1
+        connection.received_bytes += len(frame)
+        try:
+            event = WsFrameModel.validate_json(frame)
+        except ValidationError:
+            log.warning("不支持的消息类型：{}", frame, sample=5.0, bot_id=bot_id)
+            continue
+        if isinstance(event, MetaEventBase):
+            # 元事件快速路径：只更新健康表，没有处理器订阅时不进入事件总线
+            manager.record_meta_event(bot_id, event)
+            if not has_handlers(type(event)):
                 continue
-            await publish(event)
-    except WebSocketDisconnect:
-        await manager.disconnect(bot_id)
+        log.debug("{}", frame, bot_id=bot_id)
+        if isinstance(event, OneBotResponse):
+            event.self_id = bot_id
+        await publish(event, frame)
 
 
 @register
@@ -0,0 +1,135 @@
+import time
+from collections import OrderedDict
+from collections.abc import Collection
+from typing import Any
+from app.core.config import get_settings, RoutingPolicy
+from app.core import request_manager
+from app.core.request_manager import request, RequestNotSent, BotDisconnected
+from app.core.rate_limiter import Priority
+from app.api.v1.ws import manager
+from app.schemas.onebot_request import OneBotResponse
+from app.core.hotlog import get_hot_logger
+
+log = get_hot_logger(__name__)
+
+class BotRouter:
+    """
+    在多个已连接的 bot 之间选择发送请求的账号
+
+    - least_inflight：选择等待响应的请求最少的 bot
+    - round_robin：依次轮流
+    - sticky：同一 user_id 始终使用同一个 bot，该 bot 不可用时改选等待最少的并记住；
+      最多记住 sticky_size 个 user_id（LRU），闲置超过 sticky_ttl 秒或 bot 断开时遗忘
+    """
+
+    def __init__(self, policy: RoutingPolicy = 'least_inflight', sticky_size: int = 65536, sticky_ttl: float = 3600.0):
+        self.policy: RoutingPolicy = policy
+        self.sticky_size = sticky_size
+        self.sticky_ttl = sticky_ttl
+        self._turn = 0
+        # user_id -> (过期时间, bot_id)，按最近使用排列
+        self._sticky: OrderedDict[int, tuple[float, int]] = OrderedDict()
+
+    def candidates(self, bots: Collection[int] | None = None, exclude: Collection[int] = ()) -> list[int]:
+        """可用的 bot，按 bot_id 排序以保证轮询顺序稳定"""
+        available = sorted(
+            bot_id for bot_id, connection in manager.active_connections.items()
+            if not connection.closed and bot_id not in exclude and (bots is None or bot_id in bots)
+        )
+        # 心跳异常的 bot 只在没有其他可用 bot 时才使用
+        healthy = [bot_id for bot_id in available if not manager.is_suspect(bot_id)]
+        return healthy or available
+
+    def choose(
+        self,
+        user_id: int | None = None,
+        bots: Collection[int] | None = None,
+        exclude: Collection[int] = ()
+    ) -> int | None:
+        candidates = self.candidates(bots, exclude)
+        if not candidates:
+            return None
+        if self.policy == 'round_robin':
+            self._turn += 1
+            return candidates[self._turn % len(candidates)]
+        if self.policy == 'sticky' and user_id is not None:
+            bot_id = self._sticky_bot(user_id)
+            if bot_id is None or bot_id not in candidates:
+                bot_id = self._least_inflight(candidates)
+            self._stick(user_id, bot_id)
+            return bot_id
+        return self._least_inflight(candidates)
+
+    def _sticky_bot(self, user_id: int) -> int | None:
+        entry = self._sticky.get(user_id)
+        if entry is None:
+            return None
+        expires, bot_id = entry
+        if expires <= time.monotonic():
+            del self._sticky[user_id]
+            return None
+        return bot_id
+
+    def _stick(self, user_id: int, bot_id: int):
+        self._sticky[user_id] = (time.monotonic() + self.sticky_ttl, bot_id)
+        self._sticky.move_to_end(user_id)
+        while len(self._sticky) > self.sticky_size:
+            self._sticky.popitem(last=False)
+
+    def forget(self, bot_id: int):
+        """bot 断开时遗忘绑定到它的 user_id，下次按当前负载重新选择"""
+        for user_id in [user_id for user_id, (_, bound) in self._sticky.items() if bound == bot_id]:
+            del self._sticky[user_id]
+
+    @staticmethod
+    def _least_inflight(candidates: list[int]) -> int:
+        pending = request_manager.pending_requests
+        return min(candidates, key=lambda bot_id: len(pending.get(bot_id, ())))
+
+    async def send_request(
+        self,
+        action: str,
+        params: dict[str, Any],
+        timeout: float = 30.0,
+        priority: Priority = 'interactive',
+        user_id: int | None = None,
+        bots: Collection[int] | None = None,
+        retries: int | None = None
+    ) -> OneBotResponse | None:
+        """
+        选择一个 bot 发送请求；请求没能发出时换一个 bot 重试，最多 retries 次
+
+        已经发出的请求不会重试（对端可能已经执行），超时同样返回 None
+        """
+        if retries is None:
+            retries = get_settings().routing_retries
+        tried: list[int] = []
+        while len(tried) <= retries:
+            bot_id = self.choose(user_id, bots, tried)
+            if bot_id is None:
+                break
+            try:
+                return await request(bot_id, action, params, timeout, priority)
+            except BotDisconnected:
+                # 已经发出的请求不换 bot 重试
+                return None
+            except RequestNotSent:
+                log.warning("Request {} not sent via bot({}), trying another bot.", action, bot_id, sample=5.0, bot_id=bot_id)
+                tried.append(bot_id)
+        log.error("No bot available for request {}.", action, sample=5.0)
+        return None
+
+_settings = get_settings()
+router = BotRouter(_settings.routing_policy, _settings.routing_sticky_size, _settings.routing_sticky_ttl)
+manager.disconnect_listeners.append(router.forget)
+
+async def route_request(
+    action: str,
+    params: dict[str, Any],
+    timeout: float = 30.0,
+    priority: Priority = 'interactive',
+    user_id: int | None = None,
+    bots: Collection[int] | None = None
+) -> OneBotResponse | None:
+    """由默认的 router 选择 bot 发送请求"""
+    return await router.send_request(action, params, timeout, priority, user_id, bots)
@@ -0,0 +1,225 @@
+"""
+单机多进程部署：跨 worker 转发 OneBot 请求
+
+每个 worker 在 cluster_dir 下监听一个 Unix socket，并在 cluster_dir/bots/ 下为自己持有连接的 bot
+建立符号链接 bots/<bot_id> -> 本 worker 的 socket。某个 worker 要向不在本进程的 bot 发请求时，
+读取符号链接找到所属 worker，经 Unix socket 转发，由所属 worker 发出并把响应传回。
+协议为按行分隔的 json，一条连接上可以同时有多个请求，按 id 匹配响应。
+"""
+import asyncio
+import itertools
+import json
+import os
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+from loguru import logger
+from app.core.config import get_settings
+from app.core.hotlog import get_hot_logger
+from app.schemas.onebot_request import OneBotResponse
+
+log = get_hot_logger(__name__)
+
+# 所属 worker 上执行请求的回调：(bot_id, action, params, timeout, priority) -> (是否发出, 响应)
+Handler = Callable[[int, str, dict[str, Any], float, Any], Awaitable[tuple[bool, OneBotResponse | None]]]
+
+# 对端在超时后仍未回复时额外等待的时间（秒），防止对端卡住时永远等下去
+_GRACE = 5.0
+
+class NotForwarded(Exception):
+    """没有 worker 持有该 bot，或所属 worker 无法连接、未能发出请求"""
+
+class _Peer:
+    """到另一个 worker 的持久连接，多个请求复用同一条连接"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+        self._pending: dict[int, asyncio.Future[tuple[bool, OneBotResponse | None]]] = {}
+        self._ids = itertools.count()
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                self._reader_task = asyncio.create_task(self._read(reader))
+            return self._writer
+
+    async def _read(self, reader: asyncio.StreamReader):
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                future = self._pending.pop(message["id"], None)
+                if future is not None and not future.done():
+                    response = message["response"]
+                    future.set_result((message["sent"], OneBotResponse.model_validate(response) if response else None))
+        except (OSError, ValueError) as e:
+            log.error("Connection to worker {} broken: {}", self.path, e)
+        finally:
+            # 对端退出时请求可能已经发出，结果未知，按超时处理
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result((True, None))
+            self._pending.clear()
+            if self._writer is not None:
+                self._writer.close()
+
+    async def call(self, bot_id: int, action: str, params_json: str, timeout: float, priority: str) -> OneBotResponse | None:
+        try:
+            writer = await self._connect()
+        except OSError as e:
+            raise NotForwarded(bot_id, action) from e
+        request_id = next(self._ids)
+        future: asyncio.Future[tuple[bool, OneBotResponse | None]] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        head = json.dumps({"id": request_id, "bot_id": bot_id, "action": action, "timeout": timeout, "priority": priority})
+        try:
+            writer.write(f'{head[:-1]},"params":{params_json}}}\n'.encode())
+            await writer.drain()
+        except OSError as e:
+            self._pending.pop(request_id, None)
+            raise NotForwarded(bot_id, action) from e
+        try:
+            sent, response = await asyncio.wait_for(future, timeout + _GRACE)
+        except asyncio.TimeoutError:
+            self._pending.pop(request_id, None)
+            return None
+        if not sent:
+            raise NotForwarded(bot_id, action)
+        return response
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+class ClusterNode:
+    """本 worker 在集群中的节点：登记持有的 bot、接收并执行转发来的请求、向其他 worker 转发请求"""
+
+    def __init__(self, directory: str | Path, handler: Handler, name: str | None = None):
+        self.directory = Path(directory)
+        self.bots_dir = self.directory / 'bots'
+        self.path = str(self.directory / f'{name or f"worker-{os.getpid()}"}.sock')
+        self.handler = handler
+        self._server: asyncio.Server | None = None
+        self._peers: dict[str, _Peer] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def start(self):
+        self.bots_dir.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        log.info("Cluster node listening on {}", self.path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+        for peer in self._peers.values():
+            await peer.close()
+        self._peers.clear()
+        for entry in self.bots_dir.iterdir():
+            if self._owner_link(entry) == self.path:
+                entry.unlink(missing_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    @staticmethod
+    def _owner_link(entry: Path) -> str | None:
+        try:
+            return os.readlink(entry)
+        except OSError:
+            return None
+
+    def owner(self, bot_id: int) -> str | None:
+        """持有该 bot 连接的 worker 的 socket 路径"""
+        return self._owner_link(self.bots_dir / str(bot_id))
+
+    def claim(self, bot_id: int):
+        """登记本 worker 持有该 bot，原子地替换旧的登记（bot 可能从其他 worker 重连过来）"""
+        temp = self.bots_dir / f'.{bot_id}.{os.getpid()}'
+        temp.unlink(missing_ok=True)
+        os.symlink(self.path, temp)
+        os.replace(temp, self.bots_dir / str(bot_id))
+
+    def release(self, bot_id: int):
+        """取消登记，bot 已在其他 worker 重新登记时不动"""
+        entry = self.bots_dir / str(bot_id)
+        if self._owner_link(entry) == self.path:
+            entry.unlink(missing_ok=True)
+
+    async def forward(self, bot_id: int, action: str, params_json: str, timeout: float, priority: str) -> OneBotResponse | None:
+        """把请求转发给持有该 bot 的 worker，params_json 为已编码的参数"""
+        path = self.owner(bot_id)
+        if path is None or path == self.path:
+            raise NotForwarded(bot_id, action)
+        peer = self._peers.get(path)
+        if peer is None:
+            peer = self._peers[path] = _Peer(path)
+        try:
+            return await peer.call(bot_id, action, params_json, timeout, priority)
+        except NotForwarded:
+            if not os.path.exists(path):
+                # 所属 worker 已经退出，清理它留下的登记
+                log.warning("Worker {} is gone, dropping its claim on bot({}).", path, bot_id, bot_id=bot_id)
+                self._peers.pop(path, None)
+                entry = self.bots_dir / str(bot_id)
+                if self._owner_link(entry) == path:
+                    entry.unlink(missing_ok=True)
+            raise
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._handle(json.loads(line), writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (OSError, ValueError) as e:
+            log.error("Cluster connection broken: {}", e)
+
+    async def _handle(self, message: dict[str, Any], writer: asyncio.StreamWriter):
+        try:
+            sent, response = await self.handler(
+                message["bot_id"], message["action"], message["params"], message["timeout"], message["priority"]
+            )
+        except Exception:
+            # 不回复的话发起方要一直等到超时；按未发出回复，由发起方决定是否换 bot 重试
+            logger.exception(f"Failed to serve forwarded request {message.get('action')} for bot({message.get('bot_id')}).")
+            sent, response = False, None
+        body = response.model_dump_json() if response is not None else 'null'
+        try:
+            writer.write(f'{{"id":{message["id"]},"sent":{"true" if sent else "false"},"response":{body}}}\n'.encode())
+            await writer.drain()
+        except OSError:
+            pass
+
+# 未配置 cluster_dir 时为 None，即单进程部署
+node: ClusterNode | None = None
+
+@asynccontextmanager
+async def lifespan(handler: Handler):
+    """配置了 cluster_dir 时加入集群，退出时注销本 worker 的登记"""
+    global node
+    directory = get_settings().cluster_dir
+    if not directory:
+        yield
+        return
+    node = ClusterNode(directory, handler)
+    await node.start()
+    try:
+        yield
+    finally:
+        await node.stop()
+        node = None
+
+def claim_bot(bot_id: int):
+    if node is not None:
+        node.claim(bot_id)
+
+def release_bot(bot_id: int):
+    if node is not None:
+        node.release(bot_id)
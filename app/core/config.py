@@ -1,9 +1,55 @@
 from functools import lru_cache
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from loguru import logger
 
+OverflowPolicy = Literal['block', 'drop_oldest', 'drop_meta']
+RoutingPolicy = Literal['least_inflight', 'round_robin', 'sticky']
+EventBusBackend = Literal['local', 'multiprocess']
+
 class Settings(BaseSettings):
     ws_token: str = ''
+    # 每个 bot 的事件队列容量，0 表示不限
+    event_queue_size: int = 1024
+    # 队列满时的策略：阻塞 ws 读取 / 丢弃最旧事件 / 优先丢弃元事件
+    event_queue_overflow: OverflowPolicy = 'block'
+    # 执行事件处理器的工作协程数
+    event_workers: int = 16
+    # 事件总线：本进程处理，或把消息事件按 user_id 分给处理器进程（python -m app.worker）
+    # 多进程时每个持有 ws 连接的 worker 在 event_bus_dir 下监听自己的 socket，处理器进程连接其中所有的 socket
+    event_bus: EventBusBackend = 'local'
+    event_bus_dir: str = 'helpdesk-events'
+    # ws 准入控制：连接数上限、同时握手数上限（0 表示不限）、等待首个事件的秒数
+    ws_max_connections: int = 256
+    ws_max_handshakes: int = 16
+    ws_handshake_timeout: float = 1.0
+    # 心跳看门狗：错过多少个心跳标记为可疑 / 判定失活并驱逐，以及检查的最长间隔（秒）
+    heartbeat_suspect_misses: float = 1.5
+    heartbeat_dead_misses: float = 3.0
+    heartbeat_check_interval: float = 5.0
+    # 每个 bot 连接待发送帧的上限（高水位），超过后拒绝新的发送，0 表示不限
+    ws_outbox_high_water: int = 1024
+    # 每个 bot 的限流：发送类动作与查询类（get_/can_）动作的每秒令牌数及突发上限，速率为 0 表示不限
+    # 发送的默认值只用来挡住失控的循环刷屏，正常的回复不会排队；账号风控更严时按需调低
+    send_rate: float = 10.0
+    send_burst: int = 20
+    query_rate: float = 20.0
+    query_burst: int = 20
+    # 不指定 bot 发送请求时选择账号的策略，以及请求未能发出时换 bot 重试的次数
+    routing_policy: RoutingPolicy = 'least_inflight'
+    routing_retries: int = 2
+    # sticky 策略记住的 user_id 数上限（超出时淘汰最久未用的）与闲置多久后遗忘（秒）
+    routing_sticky_size: int = 65536
+    routing_sticky_ttl: float = 3600.0
+    # 查询类 OneBot 接口的缓存：每个 bot 的条目上限与默认有效期（秒），0 表示不缓存
+    onebot_cache_size: int = 4096
+    onebot_cache_ttl: float = 60.0
+    # 多 worker 部署时各 worker 共用的目录，用于 Unix socket 与 bot 登记；为空表示单进程部署
+    cluster_dir: str = ''
+    # 热路径日志（事件分发、请求收发、ws 读写）的默认级别，以及按模块覆盖的级别
+    # 例如 LOG_LEVELS='{"app.api.v1.ws": "DEBUG"}'
+    log_level: str = 'INFO'
+    log_levels: dict[str, str] = {}
     model_config = SettingsConfigDict(env_file='.env', extra='ignore')
 
 @lru_cache
@@ -0,0 +1,147 @@
+"""
+事件总线：publish 与处理器分发之间的一层
+
+- LocalEventBus：事件放入本进程的分片队列，由本进程的工作池执行处理器（默认）
+- MultiprocessEventBus：持有 ws 连接的进程把消息事件按 user_id 分区，经 Unix socket 发给
+  处理器进程（python -m app.worker），同一会话的事件始终进入同一个处理器进程，顺序不变；
+  响应与元事件以及没有处理器进程连上时的事件仍在本进程处理
+
+多个 worker 持有 ws 连接时，每个 worker 在总线目录下监听自己的 bus-<pid>.sock，
+处理器进程连接目录中所有的 socket。
+
+进程间按 4 字节长度前缀 + 原始 json 帧传输，处理器进程自行校验。
+"""
+import asyncio
+from abc import ABC, abstractmethod
+import os
+import struct
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+from pydantic import ValidationError
+from app.core.event_queue import ShardedEventQueue
+from app.core.hotlog import get_hot_logger
+from app.schemas.qq import WsMessageModel
+
+log = get_hot_logger(__name__)
+_HEADER = struct.Struct('!I')
+
+class EventBus(ABC):
+    """
+    事件从 publish 到处理器队列的传输方式
+
+    处理器的注册与分发不经过总线：每个进程（包括处理器进程）都由自己的 event_manager
+    注册处理器、从本进程的队列分发，总线只决定事件进入哪个进程的队列。
+    """
+
+    @abstractmethod
+    async def publish(self, e: Any, frame: str | bytes | None = None) -> bool:
+        """发布事件，frame 为事件的原始 json（若有），跨进程时免去重新序列化"""
+
+    @asynccontextmanager
+    async def lifespan(self) -> AsyncIterator[None]:
+        yield
+
+class LocalEventBus(EventBus):
+    def __init__(self, queue: ShardedEventQueue[Any]):
+        self.queue = queue
+
+    async def publish(self, e: Any, frame: str | bytes | None = None) -> bool:
+        return await self.queue.put(e, e.self_id)
+
+class MultiprocessEventBus(LocalEventBus):
+    def __init__(self, queue: ShardedEventQueue[Any], directory: str | Path, name: str | None = None):
+        super().__init__(queue)
+        self.directory = Path(directory)
+        # 每个 worker 一个 socket，不会占用或删除其他 worker 的 socket
+        self.path = str(self.directory / f'{name or f"bus-{os.getpid()}"}.sock')
+        # 已连接的处理器进程，按连接先后排列
+        self.consumers: list[asyncio.StreamWriter] = []
+        self._server: asyncio.Server | None = None
+
+    @asynccontextmanager
+    async def lifespan(self) -> AsyncIterator[None]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.path):
+            # 同名的 socket 只可能来自 pid 相同的已退出进程
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._accept, path=self.path)
+        log.info("Event bus listening on {}", self.path)
+        try:
+            yield
+        finally:
+            self._server.close()
+            for writer in self.consumers:
+                writer.close()
+            self.consumers.clear()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.consumers.append(writer)
+        log.info("Handler process joined, {} connected.", len(self.consumers))
+        try:
+            # 处理器进程不发送数据，读到 EOF 即表示断开
+            await reader.read()
+        finally:
+            self._remove(writer)
+
+    def _remove(self, writer: asyncio.StreamWriter):
+        if writer in self.consumers:
+            self.consumers.remove(writer)
+            log.warning("Handler process left, {} connected.", len(self.consumers))
+        writer.close()
+
+    async def publish(self, e: Any, frame: str | bytes | None = None) -> bool:
+        user_id = getattr(e, 'user_id', None)
+        if user_id is None or not self.consumers:
+            return await super().publish(e, frame)
+        # 同一 user_id 固定进入同一个处理器进程；处理器进程数变化时分区随之变化
+        writer = self.consumers[user_id % len(self.consumers)]
+        payload = frame.encode() if isinstance(frame, str) else frame if frame is not None else e.model_dump_json().encode()
+        try:
+            writer.write(_HEADER.pack(len(payload)) + payload)
+            await writer.drain()
+        except OSError:
+            self._remove(writer)
+            return await self.publish(e, frame)
+        return True
+
+async def run_consumer(directory: str | Path, queue: ShardedEventQueue[Any], retry: float = 1.0):
+    """处理器进程：每隔 retry 秒扫描总线目录，连接每个持有 ws 连接的 worker，接收事件放入本进程的队列"""
+    directory = Path(directory)
+    connections: dict[str, asyncio.Task[None]] = {}
+    try:
+        while True:
+            for path in map(str, directory.glob('*.sock')):
+                if path not in connections:
+                    task = connections[path] = asyncio.create_task(_consume(path, queue))
+                    # 断开或连接失败后移除，下次扫描时若 socket 仍在则重连
+                    task.add_done_callback(lambda _, path=path: connections.pop(path, None))
+            await asyncio.sleep(retry)
+    finally:
+        for task in list(connections.values()):
+            task.cancel()
+
+async def _consume(path: str, queue: ShardedEventQueue[Any]):
+    try:
+        reader, writer = await asyncio.open_unix_connection(path)
+    except OSError:
+        # 已退出的 worker 留下的 socket，不属于本进程，不删除
+        return
+    log.info("Connected to event bus {}", path)
+    try:
+        while True:
+            (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+            frame = await reader.readexactly(length)
+            try:
+                e = WsMessageModel.validate_json(frame)
+            except ValidationError:
+                log.warning("Dropping undecodable event from bus: {}", frame, sample=5.0)
+                continue
+            await queue.put(e, e.self_id)
+    except (asyncio.IncompleteReadError, OSError):
+        log.warning("Event bus {} disconnected.", path)
+    finally:
+        writer.close()
@@ -1,47 +1,218 @@
 import inspect
+import time
 from inspect import Parameter
 from contextlib import asynccontextmanager
-from typing import Any
-from collections.abc import Coroutine
-from asyncio import Queue, iscoroutinefunction
+from dataclasses import dataclass, field
+from typing import Any, overload
+from collections import deque
+from collections.abc import Callable, Coroutine
+from asyncio import Future, Queue, iscoroutinefunction
 import anyio
-import anyio.abc
 from loguru import logger
 from app.schemas import WsMessage, OneBotResponse
-from app.core.utils import enhanced_isinstance, MutableCallable
+from app.schemas.qq import MetaEventBase
+from app.core.utils import enhanced_isinstance, MutableCallable, union_classes
+from app.core.config import get_settings
+from app.core.event_queue import ShardedEventQueue, park, wake
+from app.core.event_bus import EventBus, LocalEventBus, MultiprocessEventBus
+from app.core.hotlog import get_hot_logger
 
 EventType = WsMessage | OneBotResponse
 HandlerType = MutableCallable[EventType, Coroutine[Any, Any, Any]]
 
-queue: Queue[EventType] = Queue()
+_settings = get_settings()
+log = get_hot_logger(__name__)
+# 按 bot(self_id) 分片的有界事件队列
+queue: ShardedEventQueue[EventType] = ShardedEventQueue(_settings.event_queue_size, _settings.event_queue_overflow)
+bus: EventBus = (
+    MultiprocessEventBus(queue, _settings.event_bus_dir) if _settings.event_bus == 'multiprocess'
+    else LocalEventBus(queue)
+)
+
+@dataclass
+class HandlerStats:
+    dispatched: int = 0
+    completed: int = 0
+    failed: int = 0
+    # 积压已满时按溢出策略丢弃的事件数
+    dropped: int = 0
+    # 从分发到开始执行的排队耗时（秒）
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        started = self.completed + self.failed
+        return self.total_wait / started if started else 0.0
+
+@dataclass(eq=False)
+class _HandlerSpec:
+    func: HandlerType
+    # 同时执行的上限，None 表示不限
+    concurrency: int | None = None
+    # 在分发循环中直接执行，只适用于开销很小的处理器
+    inline: bool = False
+    # 已提交给工作池（排队中或执行中）的任务数
+    active: int = 0
+    # 达到并发上限时积压的事件，容量与溢出策略同事件队列的分片
+    backlog: deque[tuple[EventType, float]] = field(default_factory=deque)
+    # 积压已满时阻塞的分发循环
+    putters: list[Future[None]] = field(default_factory=list)
+    stats: HandlerStats = field(default_factory=HandlerStats)
+
 handlers: dict[type[EventType], list[HandlerType]] = {}
+# 注册时编译出的索引：具体事件类 -> [(注册序号, 处理器)]
+_handler_index: dict[type, list[tuple[int, _HandlerSpec]]] = {}
+# 分发缓存：事件的具体类 -> 沿 MRO 解析出的处理器列表（按注册顺序）
+_dispatch_cache: dict[type, tuple[_HandlerSpec, ...]] = {}
+_registered_count = 0
+_Job = tuple[_HandlerSpec, EventType, float]
+
+def _resolve_handlers(cls: type) -> tuple[_HandlerSpec, ...]:
+    """按事件的具体类查找处理器，首次查找时沿 MRO 合并索引并缓存"""
+    try:
+        return _dispatch_cache[cls]
+    except KeyError:
+        pass
+    matched: dict[int, _HandlerSpec] = {}
+    for base in cls.__mro__:
+        for seq, spec in _handler_index.get(base, ()):
+            matched[seq] = spec
+    resolved = tuple(matched[seq] for seq in sorted(matched))
+    _dispatch_cache[cls] = resolved
+    return resolved
 
-async def publish(e: EventType):
+def has_handlers(cls: type) -> bool:
+    """是否有处理器订阅了该类事件（含其父类）"""
+    return bool(_resolve_handlers(cls))
+
+async def publish(e: EventType, frame: str | bytes | None = None):
+    """
+    发布事件，frame 为事件的原始 json，交给事件总线跨进程转发时使用
+
+    动作响应不进入事件队列，在调用方（ws 读取循环）中直接交给订阅者：
+    处理器可能正在等待这些响应，排在事件分发之后会在工作池占满时互相等待，
+    队列的溢出策略也不能丢弃响应或因事件积压阻塞响应。
+    """
+    if isinstance(e, OneBotResponse):
+        await _dispatch_now(e)
+        return True
     if enhanced_isinstance(e, EventType):
-        logger.debug(f"New event recv. {e}")
-        return await queue.put(e)
+        log.debug("New event recv. {}", e, bot_id=e.self_id, event=type(e).__name__)
+        return await bus.publish(e, frame)
     logger.error(f"Wrong event type detected when publish. Expect {EventType} but {type(e)}")
 
-async def run_main(tg: anyio.abc.TaskGroup):
+def get_handler_stats() -> dict[str, HandlerStats]:
+    """各处理器的执行与排队统计"""
+    specs = {spec for entries in _handler_index.values() for _, spec in entries}
+    return {f"{spec.func.__module__}.{spec.func.__qualname__}": spec.stats for spec in specs}
+
+async def _run_handler(spec: _HandlerSpec, e: EventType, queued_at: float):
+    stats = spec.stats
+    wait = time.monotonic() - queued_at
+    stats.total_wait += wait
+    if wait > stats.max_wait:
+        stats.max_wait = wait
+    try:
+        await spec.func(e)
+    except Exception:
+        stats.failed += 1
+        logger.exception(f"Handler {spec.func.__qualname__} raised while handling {type(e).__name__}.")
+    else:
+        stats.completed += 1
+
+async def _dispatch_now(e: EventType):
+    now = time.monotonic()
+    for spec in _resolve_handlers(type(e)):
+        spec.stats.dispatched += 1
+        await _run_handler(spec, e, now)
+
+async def _worker(jobs: Queue[_Job]):
+    while True:
+        spec, e, queued_at = await jobs.get()
+        while True:
+            await _run_handler(spec, e, queued_at)
+            # 达到并发上限时积压的事件由刚空出来的工作协程接着执行
+            if spec.backlog:
+                e, queued_at = spec.backlog.popleft()
+                wake(spec.putters)
+                continue
+            spec.active -= 1
+            break
+
+def _drop(spec: _HandlerSpec, e: EventType):
+    spec.stats.dropped += 1
+    log.warning("Backlog of handler {} is full, dropping {}.", spec.func.__qualname__, type(e).__name__, sample=5.0)
+
+async def _put_backlog(spec: _HandlerSpec, e: EventType, queued_at: float):
+    """积压一个事件，积压已满时按事件队列的溢出策略丢弃或阻塞分发循环"""
+    backlog = spec.backlog
+    while 0 < _settings.event_queue_size <= len(backlog):
+        overflow = _settings.event_queue_overflow
+        if overflow == 'drop_oldest':
+            _drop(spec, backlog.popleft()[0])
+            break
+        if overflow == 'drop_meta':
+            if isinstance(e, MetaEventBase):
+                _drop(spec, e)
+                return
+            victim = next((item for item in backlog if isinstance(item[0], MetaEventBase)), None)
+            if victim is not None:
+                backlog.remove(victim)
+                _drop(spec, victim[0])
+                break
+        await park(spec.putters)
+    backlog.append((e, queued_at))
+
+async def run_main(jobs: Queue[_Job]):
     while True:
         e = await queue.get()
-        logger.debug("New event got! Finding handler...")
-        for etype, handler_list in handlers.items():
-            if enhanced_isinstance(e, etype):
-                for handler in handler_list:
-                    tg.start_soon(handler, e)
+        log.debug("New event got! Finding handler...", bot_id=e.self_id, event=type(e).__name__)
+        now = time.monotonic()
+        for spec in _resolve_handlers(type(e)):
+            spec.stats.dispatched += 1
+            if spec.inline:
+                await _run_handler(spec, e, now)
+            elif spec.concurrency is not None and spec.active >= spec.concurrency:
+                await _put_backlog(spec, e, now)
+            else:
+                spec.active += 1
+                await jobs.put((spec, e, now))
 
 @asynccontextmanager
 async def lifespan(*_: Any, **__: dict[str, Any]):
     async with anyio.create_task_group() as tg:
         with anyio.CancelScope(shield=True):
-            tg.start_soon(run_main, tg)
+            # 工作池的任务队列，容量与工作协程数一致，满了会阻塞分发形成背压
+            workers = max(_settings.event_workers, 1)
+            jobs: Queue[_Job] = Queue(workers)
+            for _ in range(workers):
+                tg.start_soon(_worker, jobs)
+            tg.start_soon(run_main, jobs)
             logger.info("Event loop start!")
-            yield
+            async with bus.lifespan():
+                yield
             tg.cancel_scope.cancel()
             logger.info("Event loop cancel")
 
-def register(handler: HandlerType):
+@overload
+def register(handler: HandlerType, /) -> HandlerType: ...
+@overload
+def register(*, concurrency: int | None = None, inline: bool = False) -> Callable[[HandlerType], HandlerType]: ...
+def register(handler: HandlerType | None = None, /, *, concurrency: int | None = None, inline: bool = False) -> Any:
+    """
+    注册事件处理器，可直接作为装饰器使用，也可带参数：
+
+        @register(concurrency=2)   # 同时最多执行 2 个
+        @register(inline=True)     # 开销很小，在分发循环中直接执行
+
+    OneBotResponse 的处理器总是在收到响应的读取循环中直接执行，应当开销很小。
+    """
+    if handler is None:
+        return lambda h: register(h, concurrency=concurrency, inline=inline)  # type: ignore
+    if concurrency is not None and concurrency < 1:
+        logger.critical(f"Handler concurrency must be positive but {concurrency}")
+        raise RuntimeError()
     if not inspect.isfunction(handler):
         logger.critical("Handler not a function.")
         raise RuntimeError()
@@ -71,4 +242,12 @@ def register(handler: HandlerType):
         logger.critical(f"Handler with invalid event_type parm. Expect {type[EventType]} but {event_type}")
         raise RuntimeError()
     handlers.setdefault(event_type, []).append(handler)
+    # 将注解编译为具体类索引，分发时无需再展开 Union/Annotated
+    global _registered_count
+    seq = _registered_count
+    _registered_count += 1
+    spec = _HandlerSpec(handler, concurrency, inline)
+    for cls in union_classes(event_type):
+        _handler_index.setdefault(cls, []).append((seq, spec))
+    _dispatch_cache.clear()
     return handler
@@ -0,0 +1,104 @@
+from asyncio import Future, get_running_loop
+from collections import Counter, deque
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+from loguru import logger
+from app.core.config import OverflowPolicy
+from app.schemas.qq import MetaEventBase
+
+T = TypeVar('T')
+
+async def park(waiters: list[Future[None]]):
+    # 每次等待都在当前事件循环上新建 future，队列本身不绑定事件循环
+    waiter: Future[None] = get_running_loop().create_future()
+    waiters.append(waiter)
+    try:
+        await waiter
+    finally:
+        if waiter in waiters:
+            waiters.remove(waiter)
+
+def wake(waiters: list[Future[None]]):
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+    waiters.clear()
+
+class ShardedEventQueue(Generic[T]):
+    """
+    按分片键（通常是 bot 的 self_id）划分的有界事件队列
+
+    - 每个分片独立计算容量，一个 bot 被刷屏不会挤占其他 bot 的队列
+    - 出队时在非空分片之间轮转，保证各 bot 的延迟公平
+    - 分片满时按 overflow 策略处理：
+        block       阻塞生产者（即 ws 读取循环），形成背压
+        drop_oldest 丢弃该分片最旧的事件
+        drop_meta   优先丢弃元事件（心跳等），没有可丢弃的元事件时阻塞
+    - 只承载事件，动作响应由 publish 直接交给订阅者，溢出策略不会丢弃或阻塞响应
+    """
+
+    def __init__(self, maxsize: int = 0, overflow: OverflowPolicy = 'block'):
+        self.maxsize = maxsize
+        self.overflow: OverflowPolicy = overflow
+        self.dropped: Counter[Hashable] = Counter()
+        self._shards: dict[Hashable, deque[T]] = {}
+        # 待轮转的分片键，_scheduled 记录已在 _ready 中的键
+        self._ready: deque[Hashable] = deque()
+        self._scheduled: set[Hashable] = set()
+        self._getters: list[Future[None]] = []
+        self._putters: dict[Hashable, list[Future[None]]] = {}
+
+    def qsize(self, key: Hashable | None = None) -> int:
+        if key is not None:
+            return len(self._shards.get(key, ()))
+        return sum(len(shard) for shard in self._shards.values())
+
+    def empty(self) -> bool:
+        return not any(self._shards.values())
+
+    def _drop(self, key: Hashable, e: T):
+        self.dropped[key] += 1
+        logger.warning(f"Event queue of shard {key} is full, dropping {type(e).__name__}.")
+
+    async def put(self, e: T, key: Hashable = None) -> bool:
+        """入队，返回事件是否被接收（drop_meta 策略下新来的元事件可能被直接丢弃）"""
+        shard = self._shards.setdefault(key, deque())
+        while self.maxsize > 0 and len(shard) >= self.maxsize:
+            if self.overflow == 'drop_oldest':
+                self._drop(key, shard.popleft())
+                break
+            if self.overflow == 'drop_meta':
+                if isinstance(e, MetaEventBase):
+                    self._drop(key, e)
+                    return False
+                victim = next((x for x in shard if isinstance(x, MetaEventBase)), None)
+                if victim is not None:
+                    shard.remove(victim)
+                    self._drop(key, victim)
+                    break
+            await park(self._putters.setdefault(key, []))
+        shard.append(e)
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.append(key)
+        wake(self._getters)
+        return True
+
+    async def get(self) -> T:
+        """从下一个非空分片取出一个事件"""
+        while True:
+            while self._ready:
+                key = self._ready.popleft()
+                shard = self._shards[key]
+                if not shard:
+                    self._scheduled.discard(key)
+                    continue
+                e = shard.popleft()
+                if shard:
+                    self._ready.append(key)
+                else:
+                    self._scheduled.discard(key)
+                if putters := self._putters.get(key):
+                    wake(putters)
+                return e
+            await park(self._getters)
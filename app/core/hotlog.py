@@ -0,0 +1,69 @@
+import time
+from typing import Any
+from loguru import logger
+from app.core.config import get_settings
+
+_LEVELS = {name: logger.level(name).no for name in ("TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL")}
+
+class HotLogger:
+    """
+    消息热路径上使用的日志器
+
+    - 按模块设置级别（Settings.log_levels，未设置的模块使用 Settings.log_level），低于级别的调用在格式化前返回
+    - 消息使用 loguru 的 "{}" 占位符延迟格式化，参数的 repr 只在真正输出时才构建
+    - sample 参数对重复消息限流：同一消息模板每 sample 秒最多输出一次，并附带期间被抑制的条数
+    - 其余关键字参数作为结构化字段绑定到日志记录的 extra 上（如 bot_id、echo、event）
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        settings = get_settings()
+        self.level = settings.log_levels.get(name, settings.log_level).upper()
+        self._levelno = _LEVELS[self.level]
+        self._last_emit: dict[str, float] = {}
+        self._suppressed: dict[str, int] = {}
+
+    def set_level(self, level: str):
+        self.level = level.upper()
+        self._levelno = _LEVELS[self.level]
+
+    def is_enabled(self, level: str) -> bool:
+        return _LEVELS[level] >= self._levelno
+
+    def _emit(self, level: str, message: str, args: tuple[Any, ...], sample: float, fields: dict[str, Any]):
+        if _LEVELS[level] < self._levelno:
+            return
+        if sample:
+            now = time.monotonic()
+            if now - self._last_emit.get(message, -sample) < sample:
+                self._suppressed[message] = self._suppressed.get(message, 0) + 1
+                return
+            self._last_emit[message] = now
+            if suppressed := self._suppressed.pop(message, 0):
+                fields["suppressed"] = suppressed
+                message += f" ({suppressed} similar suppressed)"
+        # depth=2 让日志记录指向热路径的调用位置而不是本模块
+        logger.bind(**fields).opt(depth=2).log(level, message, *args)
+
+    def trace(self, message: str, *args: Any, sample: float = 0, **fields: Any):
+        self._emit("TRACE", message, args, sample, fields)
+
+    def debug(self, message: str, *args: Any, sample: float = 0, **fields: Any):
+        self._emit("DEBUG", message, args, sample, fields)
+
+    def info(self, message: str, *args: Any, sample: float = 0, **fields: Any):
+        self._emit("INFO", message, args, sample, fields)
+
+    def warning(self, message: str, *args: Any, sample: float = 0, **fields: Any):
+        self._emit("WARNING", message, args, sample, fields)
+
+    def error(self, message: str, *args: Any, sample: float = 0, **fields: Any):
+        self._emit("ERROR", message, args, sample, fields)
+
+_hot_loggers: dict[str, HotLogger] = {}
+
+def get_hot_logger(name: str) -> HotLogger:
+    """按模块名获取热路径日志器，通常传入 __name__"""
+    if (hot_logger := _hot_loggers.get(name)) is None:
+        hot_logger = _hot_loggers[name] = HotLogger(name)
+    return hot_logger
@@ -0,0 +1,187 @@
+import time
+from asyncio import AbstractEventLoop, Future, TimerHandle, get_running_loop, wait_for
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Literal
+from app.core.config import get_settings
+
+# 交互式回复优先于批量通知；同一 bot 上只有交互通道为空时才放行批量通道
+Priority = Literal['interactive', 'bulk']
+PRIORITIES: tuple[Priority, ...] = ('interactive', 'bulk')
+# 发送类动作与查询类动作分别计算配额
+Budget = Literal['send', 'query']
+
+def budget_of(action: str) -> Budget:
+    return 'query' if action.startswith(('get_', 'can_')) else 'send'
+
+@dataclass
+class WaitStats:
+    acquired: int = 0
+    # 在限流器中排队的耗时（秒）
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+    def record(self, wait: float):
+        self.acquired += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积攒 burst 个；rate 为 0 表示不限"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        if not self.rate:
+            return True
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """距离下一个令牌可用的秒数"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+@dataclass(eq=False)
+class _Lane:
+    """一个 bot 在某类配额下的令牌桶及按优先级排队的等待者"""
+    bucket: TokenBucket
+    waiters: dict[Priority, deque[tuple[Future[None], float]]] = field(
+        default_factory=lambda: {priority: deque() for priority in PRIORITIES}
+    )
+    loop: AbstractEventLoop | None = None
+    timer: TimerHandle | None = None
+
+    def has_waiters(self) -> bool:
+        return any(self.waiters.values())
+
+class RateLimiter:
+    """按 bot 的令牌桶限流器，带优先级通道，发送与查询分别限流"""
+
+    def __init__(self, send_rate: float = 0, send_burst: int = 1, query_rate: float = 0, query_burst: int = 1):
+        self._limits: dict[Budget, tuple[float, int]] = {
+            'send': (send_rate, send_burst),
+            'query': (query_rate, query_burst),
+        }
+        self._lanes: dict[tuple[int, Budget], _Lane] = {}
+        self.stats: dict[tuple[Budget, Priority], WaitStats] = {}
+
+    @classmethod
+    def from_settings(cls) -> 'RateLimiter':
+        settings = get_settings()
+        return cls(settings.send_rate, settings.send_burst, settings.query_rate, settings.query_burst)
+
+    def _lane(self, bot_id: int, budget: Budget) -> _Lane:
+        lane = self._lanes.get((bot_id, budget))
+        if lane is None:
+            lane = self._lanes[(bot_id, budget)] = _Lane(TokenBucket(*self._limits[budget]))
+        return lane
+
+    def _record(self, budget: Budget, priority: Priority, wait: float):
+        stats = self.stats.get((budget, priority))
+        if stats is None:
+            stats = self.stats[(budget, priority)] = WaitStats()
+        stats.record(wait)
+
+    def try_acquire(self, bot_id: int, action: str, priority: Priority = 'interactive') -> bool:
+        """不排队地取一个令牌，前面有等待者或令牌不足时返回 False"""
+        budget = budget_of(action)
+        lane = self._lane(bot_id, budget)
+        if lane.has_waiters() or not lane.bucket.take(time.monotonic()):
+            return False
+        self._record(budget, priority, 0.0)
+        return True
+
+    async def acquire(
+        self,
+        bot_id: int,
+        action: str,
+        priority: Priority = 'interactive',
+        timeout: float | None = None
+    ) -> float | None:
+        """等待直到可以发出该动作，返回排队的秒数；timeout 秒内没有等到令牌时返回 None，不消耗令牌"""
+        if self.try_acquire(bot_id, action, priority):
+            return 0.0
+        budget = budget_of(action)
+        lane = self._lane(bot_id, budget)
+        loop = get_running_loop()
+        if lane.loop is not loop:
+            # 换了事件循环（如测试），旧循环上的等待者与定时器已无意义
+            lane.loop, lane.timer = loop, None
+            for waiters in lane.waiters.values():
+                waiters.clear()
+        start = time.monotonic()
+        future: Future[None] = loop.create_future()
+        lane.waiters[priority].append((future, start))
+        if lane.timer is None:
+            self._grant(lane)
+        try:
+            # 超时时 wait_for 取消 future，发放令牌时会跳过已取消的等待者
+            await wait_for(future, timeout)
+        except TimeoutError:
+            try:
+                lane.waiters[priority].remove((future, start))
+            except ValueError:
+                pass
+            return None
+        finally:
+            wait = time.monotonic() - start
+            if future.done() and not future.cancelled():
+                self._record(budget, priority, wait)
+        return wait
+
+    def release(self, bot_id: int, action: str):
+        """归还一个已取得但最终没有使用的令牌（如请求在排队期间已超时）"""
+        lane = self._lanes.get((bot_id, budget_of(action)))
+        if lane is None or not lane.bucket.rate:
+            return
+        bucket = lane.bucket
+        bucket.refill(time.monotonic())
+        bucket.tokens = min(bucket.burst, bucket.tokens + 1)
+        if lane.has_waiters() and lane.loop is not None:
+            if lane.timer is not None:
+                lane.timer.cancel()
+            self._grant(lane)
+
+    def _grant(self, lane: _Lane):
+        """按优先级把令牌发给等待者，令牌不足时定时在下一个令牌可用时再试"""
+        lane.timer = None
+        bucket = lane.bucket
+        for priority in PRIORITIES:
+            waiters = lane.waiters[priority]
+            while waiters:
+                future, _ = waiters[0]
+                if future.done():
+                    waiters.popleft()
+                    continue
+                if not bucket.take(time.monotonic()):
+                    assert lane.loop is not None
+                    lane.timer = lane.loop.call_later(bucket.delay(), self._grant, lane)
+                    return
+                waiters.popleft()
+                future.set_result(None)
+
+    def queued(self, bot_id: int) -> dict[Budget, int]:
+        """各类配额下排队中的等待者数"""
+        result: dict[Budget, int] = {}
+        for budget in self._limits:
+            lane = self._lanes.get((bot_id, budget))
+            result[budget] = sum(len(waiters) for waiters in lane.waiters.values()) if lane else 0
+        return result
+
+limiter = RateLimiter.from_settings()
@@ -1,44 +1,396 @@
-import uuid
+import heapq
+import itertools
+import json
 from typing import Any
-from asyncio import Future
-from app.schemas.onebot_request import OneBotResponse, OneBotRequest
+from collections import Counter
+from collections.abc import Iterable
+from asyncio import AbstractEventLoop, Future, TimerHandle, get_running_loop, shield, gather, wait_for
+from app.schemas.onebot_request import OneBotResponse
+from app.onebot.encoder import encode_frame, encode_params
+from app.core import cluster
 from app.core.event_manager import register
 from app.api.v1.ws import manager
+from app.core.hotlog import get_hot_logger
+from app.core.rate_limiter import limiter, Priority
 from loguru import logger
-import anyio
 
-pending_requests: dict[uuid.UUID, Future[OneBotResponse]] = {}
+log = get_hot_logger(__name__)
 
-def generate_uuid():
-    while((v:=uuid.uuid4()) in pending_requests):
-        logger.warning("Duplicate uuid detect!")
-    return v
+# echo 计数在 2**32 处回绕
+ECHO_SPACE = 1 << 32
 
-async def send_request(bot_id: int, action: str, params: dict[str, Any], timeout: float = 30.0) -> OneBotResponse | None:
-    """发送请求并异步等待响应"""
-    echo = generate_uuid()
-    future: Future[OneBotResponse] = Future()
-    pending_requests[echo] = future
-    response = None
+# 等待响应的 future，超时时结果为 None
+PendingFuture = Future[OneBotResponse | None]
 
-    request_data = OneBotRequest(action=action, params=params, echo=echo)
+# 按 bot 划分的等待表：bot_id -> echo -> future
+pending_requests: dict[int, dict[str, PendingFuture]] = {}
+# 每个 bot 的 echo 计数器，bot 重连后继续递增，避免与旧连接上迟到的响应混淆
+_echo_counters: dict[int, int] = {}
 
-    async with anyio.create_task_group():
-        with anyio.move_on_after(timeout):
-            success = await manager.send_message(bot_id, request_data.model_dump_json())
-            if success:
-                response = await future
+def generate_echo(bot_id: int) -> str:
+    """生成该 bot 下唯一的短 echo（十六进制计数），跳过仍在等待响应的值"""
+    pending = pending_requests.get(bot_id, {})
+    n = _echo_counters.get(bot_id, 0)
+    while True:
+        n = (n + 1) % ECHO_SPACE
+        echo = format(n, 'x')
+        if echo not in pending:
+            break
+        logger.warning("Duplicate echo detect!")
+    _echo_counters[bot_id] = n
+    return echo
 
-    pending_requests.pop(echo, None)
-    return response
+class BotDisconnected(Exception):
+    """请求已经发出，但 bot 在响应到达前断开，对端是否执行未知"""
 
-@register
+# 等待 bot 重连以重发请求的 future：bot_id -> [future]
+_reconnect_waiters: dict[int, list[Future[None]]] = {}
+
+def _fail_pending(bot_id: int):
+    """bot 的连接已被移除，已发出的请求不会再收到响应，立即以 BotDisconnected 结束而不是等到截止时间"""
+    pending = pending_requests.pop(bot_id, None)
+    if not pending:
+        return
+    for future in pending.values():
+        if not future.done():
+            future.set_exception(BotDisconnected(bot_id))
+            # 等待者可能已经离开，不要报告未取回的异常
+            future.exception()
+    log.warning("Bot({}) disconnected, {} pending request(s) failed.", bot_id, len(pending), bot_id=bot_id)
+
+def _notify_reconnect(bot_id: int):
+    for waiter in _reconnect_waiters.pop(bot_id, ()):
+        if not waiter.done():
+            waiter.set_result(None)
+
+manager.disconnect_listeners.append(_fail_pending)
+manager.connect_listeners.append(_notify_reconnect)
+
+async def _wait_reconnect(bot_id: int, deadline: float) -> bool:
+    """等待 bot 重新连上，截止时间前没有重连返回 False"""
+    if (connection := manager.active_connections.get(bot_id)) is not None and not connection.closed:
+        # 在登记等待之前 bot 已经重连完成，不会再收到通知
+        return True
+    loop = get_running_loop()
+    waiter: Future[None] = loop.create_future()
+    _reconnect_waiters.setdefault(bot_id, []).append(waiter)
+    try:
+        await wait_for(waiter, deadline - loop.time())
+        return True
+    except TimeoutError:
+        return False
+    finally:
+        if (waiters := _reconnect_waiters.get(bot_id)) and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del _reconnect_waiters[bot_id]
+
+def _add_pending(bot_id: int) -> tuple[str, PendingFuture]:
+    echo = generate_echo(bot_id)
+    future: PendingFuture = Future()
+    pending_requests.setdefault(bot_id, {})[echo] = future
+    return echo, future
+
+def _pop_pending(bot_id: int, echo: str):
+    if (pending := pending_requests.get(bot_id)) is not None:
+        pending.pop(echo, None)
+        if not pending:
+            del pending_requests[bot_id]
+
+class _TimeoutHeap:
+    """
+    所有等待中请求共用的超时堆
+
+    只在事件循环上挂一个定时器，指向堆顶（最早）的截止时间；到期时批量把过期请求的 future
+    置为 None 并移出等待表。已完成的请求不从堆中删除，到期时直接跳过，入堆/出堆均为 O(log n)；
+    堆的大小翻倍时清理一次已完成的条目，避免长超时的请求在堆里留下大量无用条目。
+    """
+
+    # 堆中条目数达到该值时才开始清理
+    COMPACT_MIN = 1024
+
+    def __init__(self):
+        # (截止时间, 序号, future, bot_id, echo, action)，序号保证比较不会落到 future 上
+        self._heap: list[tuple[float, int, PendingFuture, int, str, str]] = []
+        self._seq = itertools.count()
+        self._loop: AbstractEventLoop | None = None
+        self._timer: TimerHandle | None = None
+        self._timer_when = float('inf')
+        self._compact_at = self.COMPACT_MIN
+        self.counts: Counter[str] = Counter()
+
+    def deadline(self, timeout: float) -> float:
+        return get_running_loop().time() + timeout
+
+    def add(self, deadline: float, future: PendingFuture, bot_id: int, echo: str, action: str):
+        loop = get_running_loop()
+        if loop is not self._loop:
+            # 换了事件循环（如测试），旧循环上的条目已无意义
+            self._loop, self._heap, self._timer, self._timer_when = loop, [], None, float('inf')
+            self._compact_at = self.COMPACT_MIN
+        heapq.heappush(self._heap, (deadline, next(self._seq), future, bot_id, echo, action))
+        if len(self._heap) >= self._compact_at:
+            self._compact()
+        if deadline < self._timer_when:
+            self._schedule(deadline)
+
+    def _compact(self):
+        """移除已完成的条目，下一次清理在剩余条目数翻倍后进行，均摊为 O(1)"""
+        self._heap = [entry for entry in self._heap if not entry[2].done()]
+        heapq.heapify(self._heap)
+        self._compact_at = max(self.COMPACT_MIN, 2 * len(self._heap))
+
+    def _schedule(self, when: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        assert self._loop is not None
+        self._timer = self._loop.call_at(when, self._expire)
+        self._timer_when = when
+
+    def _expire(self):
+        assert self._loop is not None
+        now = self._loop.time()
+        heap = self._heap
+        expired = 0
+        while heap and heap[0][0] <= now:
+            _, _, future, bot_id, echo, action = heapq.heappop(heap)
+            if future.done():
+                continue
+            future.set_result(None)
+            _pop_pending(bot_id, echo)
+            self.counts[action] += 1
+            expired += 1
+        if expired:
+            log.warning("{} request(s) timed out.", expired, sample=5.0)
+        self._timer = None
+        self._timer_when = float('inf')
+        if heap:
+            self._schedule(heap[0][0])
+
+_timeouts = _TimeoutHeap()
+
+def get_timeout_counts() -> dict[str, int]:
+    """按 action 统计的请求超时次数"""
+    return dict(_timeouts.counts)
+
+# 启用单飞的 action：同一 bot 上参数相同的并发请求只发出一帧，响应分发给所有等待者
+single_flight_actions: set[str] = set()
+# (bot_id, action, 规范化参数) -> 首个请求的结果
+_in_flight: dict[tuple[int, str, str], Future[OneBotResponse | None]] = {}
+# 按 action 统计被合并掉的请求数
+single_flight_counts: Counter[str] = Counter()
+
+def enable_single_flight(*actions: str):
+    """为幂等的 action 开启单飞；有副作用的 action（如发消息）不能开启"""
+    single_flight_actions.update(actions)
+
+def _flight_key(bot_id: int, action: str, params: dict[str, Any]) -> tuple[int, str, str] | None:
+    try:
+        return bot_id, action, json.dumps(params, sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        # 参数无法规范化时不合并
+        return None
+
+class RequestNotSent(Exception):
+    """请求未能交给 bot 的连接（连接不存在、已关闭或发送队列已满），对端不可能收到"""
+
+class RequestDropped(RequestNotSent):
+    """请求已放入发送队列，但连接断开时还没有写出，对端同样不可能收到"""
+
+async def send_request(
+    bot_id: int,
+    action: str,
+    params: dict[str, Any],
+    timeout: float = 30.0,
+    priority: Priority = 'interactive',
+    reissue: bool = False
+) -> OneBotResponse | None:
+    """
+    发送请求并异步等待响应，发出前经过限流器排队，排队时间计入超时
+
+    reissue 为 True 时，bot 在响应前断开会等它在超时前重连并重发请求；只适用于幂等的请求，
+    因为断开前对端可能已经执行过一次
+    """
+    try:
+        return await request(bot_id, action, params, timeout, priority, reissue)
+    except (RequestNotSent, BotDisconnected):
+        return None
+
+async def request(
+    bot_id: int,
+    action: str,
+    params: dict[str, Any],
+    timeout: float = 30.0,
+    priority: Priority = 'interactive',
+    reissue: bool = False
+) -> OneBotResponse | None:
+    """同 send_request，但未能发出时抛出 RequestNotSent、发出后 bot 断开时抛出 BotDisconnected，便于调用方区分处理"""
+    if action not in single_flight_actions or (key := _flight_key(bot_id, action, params)) is None:
+        return await _send_request(bot_id, action, params, timeout, priority, reissue=reissue)
+    if (leader := _in_flight.get(key)) is not None:
+        single_flight_counts[action] += 1
+        # shield：某个等待者被取消时不影响其他等待者
+        return await shield(leader)
+    shared: Future[OneBotResponse | None] = Future()
+    _in_flight[key] = shared
+    result = None
+    try:
+        result = await _send_request(bot_id, action, params, timeout, priority, reissue=reissue)
+        return result
+    except (RequestNotSent, BotDisconnected) as e:
+        shared.set_exception(e)
+        # 没有其他等待者时也不要报告未取回的异常
+        shared.exception()
+        raise
+    finally:
+        del _in_flight[key]
+        # 首个请求被取消或出错时，其余等待者得到 None，与超时一致
+        if not shared.done():
+            shared.set_result(result)
+
+def _is_remote(bot_id: int) -> bool:
+    """该 bot 的连接不在本进程，但集群中可能有其他 worker 持有"""
+    return cluster.node is not None and bot_id not in manager.active_connections
+
+async def _send_request(
+    bot_id: int,
+    action: str,
+    params: dict[str, Any],
+    timeout: float,
+    priority: Priority,
+    forward: bool = True,
+    reissue: bool = False
+) -> OneBotResponse | None:
+    if forward and _is_remote(bot_id):
+        assert cluster.node is not None
+        try:
+            return await cluster.node.forward(bot_id, action, encode_params(params), timeout, priority)
+        except cluster.NotForwarded:
+            raise RequestNotSent(bot_id, action)
+    deadline = _timeouts.deadline(timeout)
+    while True:
+        try:
+            return await _send_once(bot_id, action, params, deadline, priority)
+        except (BotDisconnected, RequestDropped):
+            if not reissue:
+                raise
+        log.info("Waiting for bot({}) to reconnect to reissue {}.", bot_id, action, bot_id=bot_id)
+        if not await _wait_reconnect(bot_id, deadline):
+            _timeouts.counts[action] += 1
+            return None
+
+async def _send_once(bot_id: int, action: str, params: dict[str, Any], deadline: float, priority: Priority) -> OneBotResponse | None:
+    # 先编码参数，编码失败时还没有登记等待表与超时堆
+    params_json = encode_params(params)
+    echo, future = _add_pending(bot_id)
+    _timeouts.add(deadline, future, bot_id, echo, action)
+    frame = encode_frame(action, params_json, echo)
+    try:
+        # 在限流器中等待的时间不超过请求剩余的时间
+        if await limiter.acquire(bot_id, action, priority, timeout=deadline - get_running_loop().time()) is None:
+            return None
+        if future.done():
+            # 排队期间已经超时，不再发出，令牌留给其他请求
+            limiter.release(bot_id, action)
+            return None
+        written: Future[bool] = get_running_loop().create_future()
+        if not await manager.send_message(bot_id, frame, written):
+            raise RequestNotSent(bot_id, action)
+        try:
+            return await future
+        except BotDisconnected:
+            if written.done() and not written.result():
+                # 断开时帧还在发送队列里，可以放心地换 bot 重试
+                raise RequestDropped(bot_id, action) from None
+            raise
+    finally:
+        _pop_pending(bot_id, echo)
+
+async def _result_or_none(future: PendingFuture) -> OneBotResponse | None:
+    try:
+        return await future
+    except BotDisconnected:
+        return None
+
+async def send_requests_many(
+    bot_id: int,
+    requests: Iterable[tuple[str, dict[str, Any]]],
+    timeout: float = 30.0,
+    priority: Priority = 'bulk'
+) -> list[OneBotResponse | None]:
+    """
+    批量发送请求：先一次性序列化整批请求，再连续写入 bot 的连接，响应到达即完成对应的请求
+
+    限流器当下放行的帧一起写入，其余逐个排队；整批共用一个超时，
+    返回与 requests 顺序一致的结果，超时或未发送成功的位置为 None
+    """
+    if _is_remote(bot_id):
+        # 其他 worker 持有的 bot：逐个转发，由所属 worker 限流与发送
+        return list(await gather(*(send_request(bot_id, action, params, timeout, priority) for action, params in requests)))
+    deadline = _timeouts.deadline(timeout)
+    echoes: list[str] = []
+    actions: list[str] = []
+    futures: list[PendingFuture] = []
+    frames: list[str] = []
+    # 先编码整批参数，任何一个编码失败时还没有登记等待表与超时堆
+    encoded = [(action, encode_params(params)) for action, params in requests]
+    for action, params_json in encoded:
+        echo, future = _add_pending(bot_id)
+        _timeouts.add(deadline, future, bot_id, echo, action)
+        echoes.append(echo)
+        actions.append(action)
+        futures.append(future)
+        frames.append(encode_frame(action, params_json, echo))
+
+    try:
+        sent = 0
+        while sent < len(frames):
+            end = sent
+            while end < len(frames) and limiter.try_acquire(bot_id, actions[end], priority):
+                end += 1
+            if end == sent:
+                if await limiter.acquire(bot_id, actions[sent], priority, timeout=deadline - get_running_loop().time()) is None:
+                    break
+                end += 1
+            if futures[sent].done():
+                # 整批共用截止时间，排队期间已超时则不再发出剩余的帧，令牌留给其他请求
+                for action in actions[sent:end]:
+                    limiter.release(bot_id, action)
+                break
+            written = await manager.send_messages(bot_id, frames[sent:end])
+            sent += written
+            if sent < end:
+                # 发送队列已满，没能入队的帧不会发出，令牌留给其他请求
+                for action in actions[sent:end]:
+                    limiter.release(bot_id, action)
+                break
+        return [await _result_or_none(future) for future in futures[:sent]] + [None] * (len(futures) - sent)
+    finally:
+        for echo in echoes:
+            _pop_pending(bot_id, echo)
+
+async def serve_forwarded(
+    bot_id: int,
+    action: str,
+    params: dict[str, Any],
+    timeout: float,
+    priority: Priority
+) -> tuple[bool, OneBotResponse | None]:
+    """执行其他 worker 转发来的请求，不再向外转发，避免 bot 在 worker 间迁移时来回转发"""
+    try:
+        return True, await _send_request(bot_id, action, params, timeout, priority, forward=False)
+    except RequestNotSent:
+        return False, None
+    except BotDisconnected:
+        return True, None
+
+@register(inline=True)
 async def handle_response(e: OneBotResponse):
     """处理接收到的响应消息"""
-    if e.echo and e.echo in pending_requests:
-        future = pending_requests[e.echo]
+    pending = pending_requests.get(e.self_id) if e.self_id is not None else None
+    if pending and (future := pending.get(e.echo)) is not None:
         if not future.done():
             future.set_result(e)
-            logger.debug(f"Response matched for echo {e.echo}")
+            log.debug("Response matched for echo {}", e.echo, bot_id=e.self_id, echo=e.echo)
         else:
-            logger.warning(f"Unmatched response with echo {e.echo}")
\ No newline at end of file
+            log.warning("Unmatched response with echo {}", e.echo, sample=5.0, bot_id=e.self_id, echo=e.echo)
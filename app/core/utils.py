@@ -9,7 +9,7 @@ from typing import (
 )
 import types
 import collections.abc
-from functools import reduce
+from functools import reduce, lru_cache
 import operator
 
 def _extract_union_types(type_hint: Any) -> set[Any]:
@@ -49,6 +49,203 @@ def _extract_union_types(type_hint: Any) -> set[Any]:
     
     return result
 
+TypeChecker = collections.abc.Callable[[Any], bool]
+
+_TYPE_CHECKER_CACHE_SIZE = 1024
+
+def _always_true(_: Any) -> bool:
+    return True
+
+def _is_union(origin: Any, type_hint: Any) -> bool:
+    return origin is Union or isinstance(type_hint, types.UnionType)  # type: ignore  # 为了向后兼容性保留 Union 支持
+
+def _flatten_union(type_hint: Any) -> list[Any]:
+    """按顺序展开嵌套的 Union 与 Annotated，返回其余类型提示组成的列表"""
+    origin = get_origin(type_hint)
+    args = get_args(type_hint)
+    if _is_union(origin, type_hint):
+        return [member for arg in args for member in _flatten_union(arg)]
+    if origin is Annotated:
+        return _flatten_union(args[0] if args else Any)
+    return [type_hint]
+
+def union_classes(type_hint: Any) -> tuple[type, ...]:
+    """
+    展开 Union 与 Annotated，返回其中的具体类（按出现顺序去重）
+
+    泛型别名等不是类的成员会被忽略，适合用作 isinstance/issubclass 的第二个参数或按类建立索引。
+    """
+    return tuple(dict.fromkeys(t for t in _flatten_union(type_hint) if isinstance(t, type)))
+
+def _compile_subclass_checker(target_type: Any) -> TypeChecker:
+    """
+    将目标类型编译为 issubclass 风格的检查闭包，语义与 _check_type_compatibility 一致
+    """
+    origin = get_origin(target_type)
+    args = get_args(target_type)
+
+    if _is_union(origin, target_type):
+        checkers = tuple(compile_subclass_checker(arg) for arg in args)
+        return lambda obj_type: any(check(obj_type) for check in checkers)
+
+    if origin is Annotated:
+        return compile_subclass_checker(args[0] if args else Any)
+
+    if isinstance(target_type, type):
+        def check_subclass(obj_type: Any) -> bool:
+            try:
+                return issubclass(obj_type, target_type)
+            except TypeError:
+                return False
+        return check_subclass
+
+    return lambda _: False
+
+def _compile_type_arg_checker(target: Any) -> TypeChecker:
+    """编译 type[X] 的检查闭包"""
+    if target is Any:
+        def check_any_type(obj: Any) -> bool:
+            return isinstance(obj, type) or (hasattr(obj, '__origin__') and get_origin(obj) is type)
+        return check_any_type
+
+    # 预先展开联合类型，运行时只需一次 issubclass
+    classes = union_classes(target)
+    compatible = compile_subclass_checker(target)
+    check_arg = (lambda arg: isinstance(arg, type)) if target is type else compile_type_checker(target)
+
+    def check_type(obj: Any) -> bool:
+        if isinstance(obj, type):
+            try:
+                return issubclass(obj, classes)
+            except TypeError:
+                return compatible(obj)
+        if hasattr(obj, '__origin__') and get_origin(obj) is type:
+            # 处理 type[X] 泛型别名的情况
+            obj_args = get_args(obj)
+            return bool(obj_args) and check_arg(obj_args[0])
+        return False
+    return check_type
+
+def _compile_container_checker(origin: Any, args: tuple[Any, ...]) -> TypeChecker:
+    """编译泛型容器 (list[int], dict[str, int] 等) 的检查闭包"""
+    if origin in (list, collections.abc.Sequence) or origin is set:
+        check_item = compile_type_checker(args[0])
+        return lambda obj: isinstance(obj, origin) and all(check_item(x) for x in obj)
+
+    if origin in (dict, collections.abc.Mapping):
+        check_key = compile_type_checker(args[0])
+        check_value = compile_type_checker(args[1])
+        return lambda obj: (
+            isinstance(obj, origin) and
+            all(check_key(k) for k in obj.keys()) and
+            all(check_value(v) for v in obj.values())
+        )
+
+    if origin is tuple:
+        # 处理空元组类型 tuple[()]
+        if not args:
+            return lambda obj: isinstance(obj, tuple) and len(obj) == 0  # type: ignore
+        if len(args) == 2 and args[1] == ...:  # 不定长元组 Tuple[T, ...]
+            check_item = compile_type_checker(args[0])
+            return lambda obj: isinstance(obj, tuple) and all(check_item(x) for x in obj)  # type: ignore
+        # 定长元组 Tuple[T1, T2, ...]
+        checkers = tuple(compile_type_checker(t) for t in args)
+        return lambda obj: (
+            isinstance(obj, tuple) and
+            len(obj) == len(checkers) and  # type: ignore
+            all(check(x) for check, x in zip(checkers, obj))  # type: ignore
+        )
+
+    # 其他泛型类型暂不深入检查
+    return lambda obj: isinstance(obj, origin)
+
+def _compile_type_checker(type_hint: Any) -> TypeChecker:
+    """
+    将类型提示编译为检查闭包，语义与 enhanced_isinstance 一致
+
+    类型树只在编译时遍历一次，运行时闭包只做必要的 isinstance/issubclass 调用
+    """
+    # 处理 TypeVar
+    if isinstance(type_hint, TypeVar):
+        return _always_true  # TypeVar 不做具体检查，或者可以添加约束检查
+
+    origin = get_origin(type_hint)
+    args = get_args(type_hint)
+
+    # 处理联合类型 (Union 和 |)
+    if _is_union(origin, type_hint):
+        # 展开嵌套的 Union/Annotated，普通类成员合并为一次 isinstance(obj, (A, B, ...)) 调用
+        members = _flatten_union(type_hint)
+        classes = tuple(t for t in members if isinstance(t, type) and t is not Any)
+        checkers = tuple(compile_type_checker(t) for t in members if t not in classes)
+        if not checkers:
+            return lambda obj: isinstance(obj, classes)
+        if not classes:
+            return lambda obj: any(check(obj) for check in checkers)
+        return lambda obj: isinstance(obj, classes) or any(check(obj) for check in checkers)
+
+    # 处理 Annotated 类型，嵌套的 Annotated 在编译时递归展开
+    if origin is Annotated:
+        return compile_type_checker(args[0] if args else Any)
+
+    if origin is not None and hasattr(type_hint, "__origin__"):
+        # 特殊处理 type[X] 情况
+        if origin is type:
+            return _compile_type_arg_checker(args[0])
+        return _compile_container_checker(origin, args)
+
+    # 特殊处理 Any 类型，Any 匹配任何类型
+    if type_hint is Any:
+        return _always_true
+
+    # 特殊处理 None (因为 isinstance(None, type(None)) 比 isinstance(None, None) 更好)
+    if type_hint is type(None):
+        return lambda obj: obj is None
+
+    if isinstance(type_hint, type):
+        return lambda obj: isinstance(obj, type_hint)
+
+    # 处理一些特殊情况，isinstance 无法检查的类型视为不匹配
+    def check_instance(obj: Any) -> bool:
+        try:
+            return isinstance(obj, type_hint)
+        except TypeError:
+            return False
+    return check_instance
+
+_compile_type_checker_cached = lru_cache(maxsize=_TYPE_CHECKER_CACHE_SIZE)(_compile_type_checker)
+_compile_subclass_checker_cached = lru_cache(maxsize=_TYPE_CHECKER_CACHE_SIZE)(_compile_subclass_checker)
+
+def compile_type_checker(type_hint: Any) -> TypeChecker:
+    """
+    将类型提示编译为 `obj -> bool` 的检查闭包，并按类型提示对象缓存
+
+    参数:
+        type_hint: 类型提示 (可以是普通类型或复杂类型注解)
+
+    返回:
+        TypeChecker: 检查对象是否符合类型提示的闭包
+
+    示例:
+        >>> is_str_list = compile_type_checker(list[str])
+        >>> is_str_list(["a", "b"])
+        True
+    """
+    try:
+        return _compile_type_checker_cached(type_hint)
+    except TypeError:
+        # 不可哈希的类型提示无法缓存，直接编译
+        return _compile_type_checker(type_hint)
+
+def compile_subclass_checker(target_type: Any) -> TypeChecker:
+    """
+    将目标类型编译为 `obj_type -> bool` 的 issubclass 风格检查闭包，并按类型提示对象缓存
+    """
+    try:
+        return _compile_subclass_checker_cached(target_type)
+    except TypeError:
+        return _compile_subclass_checker(target_type)
+
 def _check_type_compatibility(obj_type: type, target_type: Any) -> bool:
     """
     检查类型兼容性，特别处理复杂的联合类型
@@ -60,28 +257,7 @@ def _check_type_compatibility(obj_type: type, target_type: Any) -> bool:
     返回:
         bool: 是否兼容
     """
-    # 获取类型的原始类型和参数
-    origin = get_origin(target_type)
-    args = get_args(target_type)
-    
-    # 处理联合类型
-    if origin is Union or isinstance(target_type, types.UnionType):  # type: ignore
-        return any(_check_type_compatibility(obj_type, arg) for arg in args)
-    
-    # 处理 Annotated 类型
-    if origin is Annotated:
-        actual_type = args[0] if args else Any
-        return _check_type_compatibility(obj_type, actual_type)
-    
-    # 如果是具体类型，检查继承关系
-    if isinstance(target_type, type):
-        try:
-            return issubclass(obj_type, target_type)
-        except TypeError:
-            return False
-    
-    # 其他情况返回 False
-    return False
+    return compile_subclass_checker(target_type)(obj_type)
 
 def enhanced_isinstance(obj: Any, type_hint: Any) -> bool:
     """
@@ -117,111 +293,7 @@ def enhanced_isinstance(obj: Any, type_hint: Any) -> bool:
         >>> enhanced_isinstance([1, "2", 3], list[int | str])
         True
     """
-    # 处理 TypeVar
-    if isinstance(type_hint, TypeVar):
-        return True  # TypeVar 不做具体检查，或者可以添加约束检查
-    
-    # 获取类型的原始类型和参数
-    origin = get_origin(type_hint)
-    args = get_args(type_hint)
-    
-    # 处理联合类型 (Union 和 |)
-    if origin is Union or isinstance(type_hint, types.UnionType):  # type: ignore  # 为了向后兼容性保留 Union 支持
-        return any(enhanced_isinstance(obj, t) for t in args)
-    
-    # 处理 Annotated 类型
-    if origin is Annotated:
-        # 提取实际类型 (第一个参数)
-        actual_type = args[0] if args else Any
-        # 递归处理可能嵌套的 Annotated
-        return enhanced_isinstance(obj, actual_type)
-    
-    # 处理泛型容器 (List[int], Dict[str, int] 等)
-    if origin is not None and hasattr(type_hint, "__origin__"):
-        # 特殊处理 type[X] 情况 - 不需要检查 isinstance(obj, type)
-        if origin is type:
-            # 检查是否为类型对象或泛型别名
-            if isinstance(obj, type):
-                # 如果参数是 Any，则只需检查是否为类型对象
-                if args[0] is Any:
-                    return True
-                
-                # 处理复杂联合类型的情况
-                # 提取目标类型中的所有具体类型
-                target_types = _extract_union_types(args[0])
-                
-                # 如果目标类型集合为空，说明是复杂的类型注解，需要特殊处理
-                if not target_types:
-                    # 对于复杂的联合类型，直接检查类型关系
-                    return _check_type_compatibility(obj, args[0])
-                
-                # 检查 obj 是否是目标类型中的任一类型或其子类
-                try:
-                    return any(issubclass(obj, target_type) for target_type in target_types if isinstance(target_type, type))
-                except TypeError:
-                    # 如果 issubclass 失败，尝试用兼容性检查
-                    return _check_type_compatibility(obj, args[0])
-                
-            elif hasattr(obj, '__origin__') and get_origin(obj) is type:
-                # 处理 type[X] 泛型别名的情况
-                if args[0] is Any:
-                    return True
-                # 检查泛型别名的参数是否匹配
-                obj_args = get_args(obj)
-                if obj_args:
-                    # 如果期望的参数也是 type，那么需要检查 obj_args[0] 是否为类型对象
-                    if args[0] is type:
-                        return isinstance(obj_args[0], type)
-                    else:
-                        return enhanced_isinstance(obj_args[0], args[0])
-                return False
-            return False
-        
-        # 对于其他容器，先检查是否是容器的实例
-        if not isinstance(obj, origin):
-            return False
-        
-        # 特殊处理常见容器
-        if origin in (list, collections.abc.Sequence):
-            return all(enhanced_isinstance(x, args[0]) for x in obj)
-        elif origin in (dict, collections.abc.Mapping):
-            return (
-                all(enhanced_isinstance(k, args[0]) for k in obj.keys()) and
-                all(enhanced_isinstance(v, args[1]) for v in obj.values())
-            )
-        elif origin is tuple:
-            # 处理空元组类型 tuple[()]
-            if not args:
-                return len(obj) == 0
-            elif len(args) == 2 and args[1] == ...:  # 不定长元组 Tuple[T, ...]
-                return all(enhanced_isinstance(x, args[0]) for x in obj)
-            else:  # 定长元组 Tuple[T1, T2, ...]
-                return (
-                    len(obj) == len(args) and
-                    all(enhanced_isinstance(x, t) for x, t in zip(obj, args))
-                )
-        elif origin is set:
-            return all(enhanced_isinstance(x, args[0]) for x in obj)
-        
-        # 其他泛型类型暂不深入检查
-        return True
-    
-    # 特殊处理 Any 类型，Any 匹配任何类型
-    if type_hint is Any:
-        return True
-
-    # 特殊处理 None (因为 isinstance(None, type(None)) 比 isinstance(None, None) 更好)
-    if type_hint is type(None):
-        return obj is None
-    
-    # 普通类型检查
-    try:
-        return isinstance(obj, type_hint)
-    except TypeError:
-        # 处理一些特殊情况，比如抽象基类
-        if isinstance(type_hint, type):
-            return isinstance(obj, type_hint)
-        return False
+    return compile_type_checker(type_hint)(obj)
 
 class _MutableCallableMeta(type):
     """
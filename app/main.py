@@ -1,8 +1,17 @@
+from contextlib import asynccontextmanager
+from typing import Any
 from fastapi import FastAPI
 from app.api.v1 import ws
 from app.api.v1.endpoints import tests
-from app.core.event_manager import lifespan
+from app.core import cluster
+from app.core.event_manager import lifespan as event_lifespan
+from app.core.request_manager import serve_forwarded
+
+@asynccontextmanager
+async def lifespan(*_: Any):
+    async with event_lifespan(), cluster.lifespan(serve_forwarded):
+        yield
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(ws.router)
-app.include_router(tests.router)
\ No newline at end of file
+app.include_router(tests.router)
@@ -1,10 +1,133 @@
-from typing import TypedDict, Unpack
-from app.core.request_manager import send_request
-from app.schemas.qq import MessageSegment
+from typing import Any, TypedDict, NotRequired, Unpack
+from collections.abc import Sequence
+from app.core.request_manager import send_request, enable_single_flight
+from app.core.event_manager import register
+from app.core.config import get_settings
+from app.core.rate_limiter import Priority
+from app.onebot import encoder
+from app.onebot.cache import TTLCache
+from app.onebot.encoder import RawSegment
+from app.schemas.onebot_request import OneBotResponse
+from app.schemas.qq import MessageSegment, ConnectEvent, GroupMessage
+
+_settings = get_settings()
+# 查询类接口的响应缓存，只缓存成功的响应
+cache = TTLCache(_settings.onebot_cache_size, _settings.onebot_cache_ttl)
+# 消息内容不会变化，可以缓存更久
+_ACTION_TTL: dict[str, float] = {"get_msg": 600.0}
+
+# 查询均为幂等操作，缓存未命中时的并发请求合并为一帧
+enable_single_flight(
+    "get_login_info", "get_friend_list", "get_stranger_info", "get_group_list",
+    "get_group_info", "get_group_member_list", "get_group_member_info", "get_msg",
+)
+
+# 发送的消息：纯文本，或消息段列表（pydantic 消息段与 encoder 生成的预编码消息段可混用）
+OutgoingMessage = str | Sequence[MessageSegment | RawSegment]
 
 class PrivateMsgParam(TypedDict):
     user_id: int
-    message: list[MessageSegment]
+    message: OutgoingMessage
+
+class GroupMsgParam(TypedDict):
+    group_id: int
+    message: OutgoingMessage
+
+class NoCacheParam(TypedDict):
+    # 为 True 时跳过缓存直接请求，并用新响应刷新缓存
+    no_cache: NotRequired[bool]
+
+class UserParam(NoCacheParam):
+    user_id: int
+
+class GroupParam(NoCacheParam):
+    group_id: int
+
+class GroupMemberParam(NoCacheParam):
+    group_id: int
+    user_id: int
+
+class MsgParam(TypedDict):
+    message_id: int
+
+async def send_private_msg(
+    bot_id: int,
+    timeout: float = 30.0,
+    priority: Priority = 'interactive',
+    **params: Unpack[PrivateMsgParam]
+):
+    return await send_request(bot_id, "send_private_msg", _message_params(params), timeout, priority)
+
+async def send_group_msg(
+    bot_id: int,
+    timeout: float = 30.0,
+    priority: Priority = 'interactive',
+    **params: Unpack[GroupMsgParam]
+):
+    return await send_request(bot_id, "send_group_msg", _message_params(params), timeout, priority)
+
+def _message_params(params: PrivateMsgParam | GroupMsgParam) -> dict[str, Any]:
+    result: dict[str, Any] = dict(params)
+    if isinstance(message := result["message"], str):
+        result["message"] = [encoder.text(message)]
+    return result
+
+async def cached_request(bot_id: int, action: str, params: dict[str, Any], timeout: float = 30.0) -> OneBotResponse | None:
+    """发送幂等的查询请求，优先使用缓存；no_cache 参数原样转发给协议端"""
+    if not _settings.onebot_cache_ttl:
+        return await send_request(bot_id, action, params, timeout)
+    key = (action, tuple(sorted((k, v) for k, v in params.items() if k != "no_cache")))
+    if not params.get("no_cache"):
+        if (response := cache.get(bot_id, key)) is not None:
+            return response
+    response = await send_request(bot_id, action, params, timeout)
+    if response is not None and response.status == "ok":
+        cache.set(bot_id, key, response, _ACTION_TTL.get(action))
+    return response
+
+async def get_login_info(bot_id: int, timeout: float = 30.0):
+    return await cached_request(bot_id, "get_login_info", {}, timeout)
+
+async def get_friend_list(bot_id: int, timeout: float = 30.0, **params: Unpack[NoCacheParam]):
+    return await cached_request(bot_id, "get_friend_list", dict(params), timeout)
+
+async def get_stranger_info(bot_id: int, timeout: float = 30.0, **params: Unpack[UserParam]):
+    return await cached_request(bot_id, "get_stranger_info", dict(params), timeout)
+
+async def get_group_list(bot_id: int, timeout: float = 30.0, **params: Unpack[NoCacheParam]):
+    return await cached_request(bot_id, "get_group_list", dict(params), timeout)
+
+async def get_group_info(bot_id: int, timeout: float = 30.0, **params: Unpack[GroupParam]):
+    return await cached_request(bot_id, "get_group_info", dict(params), timeout)
+
+async def get_group_member_list(bot_id: int, timeout: float = 30.0, **params: Unpack[GroupParam]):
+    return await cached_request(bot_id, "get_group_member_list", dict(params), timeout)
+
+async def get_group_member_info(bot_id: int, timeout: float = 30.0, **params: Unpack[GroupMemberParam]):
+    return await cached_request(bot_id, "get_group_member_info", dict(params), timeout)
+
+async def get_msg(bot_id: int, timeout: float = 30.0, **params: Unpack[MsgParam]):
+    return await cached_request(bot_id, "get_msg", dict(params), timeout)
+
+@register(inline=True)
+async def invalidate_on_connect(e: ConnectEvent):
+    """bot 重新连接后，之前缓存的账号、好友、群信息都可能已过时"""
+    cache.invalidate(e.self_id)
+
+# (bot_id, group_id) -> (成员列表响应, 其中的 user_id 集合)，避免每条群消息都遍历成员列表
+_member_ids: dict[tuple[int, int], tuple[OneBotResponse, frozenset[int]]] = {}
 
-async def send_private_msg(bot_id: int, timeout: float = 30.0, **params: Unpack[PrivateMsgParam]):
-    return await send_request(bot_id, "send_private_msg", dict(params), timeout)
\ No newline at end of file
+@register(inline=True)
+async def invalidate_on_new_member(e: GroupMessage):
+    """群里出现成员列表中没有的发言者时，说明有新成员，成员列表缓存失效"""
+    key = ("get_group_member_list", (("group_id", e.group_id),))
+    response = cache.peek(e.self_id, key)
+    if response is None or not isinstance(response.data, list):
+        _member_ids.pop((e.self_id, e.group_id), None)
+        return
+    cached = _member_ids.get((e.self_id, e.group_id))
+    if cached is None or cached[0] is not response:
+        cached = _member_ids[(e.self_id, e.group_id)] = (response, frozenset(member.get("user_id") for member in response.data))
+    if e.user_id not in cached[1]:
+        cache.invalidate(e.self_id, lambda k: k == key)
+        del _member_ids[(e.self_id, e.group_id)]
@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+CacheKey = tuple[str, Hashable]
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    # 因容量上限被淘汰的条目数
+    evictions: int = 0
+    # 因过期或事件失效被移除的条目数
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class TTLCache:
+    """
+    按 bot 分区的 TTL + LRU 缓存
+
+    每个 bot 一个分区，各自受 maxsize 约束，命中时移到最近使用的一端，满时淘汰最久未使用的条目。
+    键为 (action, 参数)，便于按 action 整体失效。
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._partitions: dict[int, OrderedDict[CacheKey, tuple[float, Any]]] = {}
+        self.stats: dict[str, CacheStats] = {}
+
+    def _stats(self, action: str) -> CacheStats:
+        stats = self.stats.get(action)
+        if stats is None:
+            stats = self.stats[action] = CacheStats()
+        return stats
+
+    def get(self, bot_id: int, key: CacheKey) -> Any | None:
+        partition = self._partitions.get(bot_id)
+        entry = partition.get(key) if partition is not None else None
+        stats = self._stats(key[0])
+        if entry is None:
+            stats.misses += 1
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del partition[key]  # type: ignore
+            stats.invalidations += 1
+            stats.misses += 1
+            return None
+        partition.move_to_end(key)  # type: ignore
+        stats.hits += 1
+        return value
+
+    def set(self, bot_id: int, key: CacheKey, value: Any, ttl: float | None = None):
+        partition = self._partitions.get(bot_id)
+        if partition is None:
+            partition = self._partitions[bot_id] = OrderedDict()
+        partition[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        partition.move_to_end(key)
+        while len(partition) > self.maxsize:
+            evicted, _ = partition.popitem(last=False)
+            self._stats(evicted[0]).evictions += 1
+
+    def invalidate(self, bot_id: int, predicate: Callable[[CacheKey], bool] | None = None) -> int:
+        """移除该 bot 下满足条件的条目（不指定条件时清空整个分区），返回移除的条目数"""
+        partition = self._partitions.get(bot_id)
+        if not partition:
+            return 0
+        keys = [key for key in partition if predicate is None or predicate(key)]
+        for key in keys:
+            del partition[key]
+            self._stats(key[0]).invalidations += 1
+        if not partition:
+            del self._partitions[bot_id]
+        return len(keys)
+
+    def peek(self, bot_id: int, key: CacheKey) -> Any | None:
+        """读取条目但不计入统计、不调整 LRU 顺序，过期条目视为不存在"""
+        partition = self._partitions.get(bot_id)
+        entry = partition.get(key) if partition is not None else None
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in self._partitions.values())
@@ -0,0 +1,100 @@
+"""
+发送请求的 json 编码器
+
+回复消息时不必先构造 TextMessageSegment(data=TextData(...))、再包进 OneBotRequest、最后通用地序列化：
+用 text()、at() 等从普通参数直接生成预编码的消息段（固定部分预先渲染好），
+encode_request 把参数逐项拼接为请求帧。pydantic 模型按类型缓存其序列化器，同样可以混用。
+"""
+import json
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Literal
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+@dataclass(frozen=True, slots=True)
+class RawSegment:
+    """已编码为 json 的消息段"""
+    json: str
+
+# 各类消息段中不变的前缀
+_TEXT = '{"type":"text","data":{"text":'
+_AT = '{"type":"at","data":{"qq":'
+_REPLY = '{"type":"reply","data":{"id":'
+_FORWARD = '{"type":"forward","data":{"id":'
+_IMAGE = '{"type":"image","data":{"file":'
+_VIDEO = '{"type":"video","data":{"file":'
+_FILE = '{"type":"file","data":{"file":'
+
+def text(content: str) -> RawSegment:
+    return RawSegment(f'{_TEXT}{_dumps(content)}}}}}')
+
+def at(qq: int | Literal["all"]) -> RawSegment:
+    return RawSegment(f'{_AT}{qq if isinstance(qq, int) else _dumps(qq)}}}}}')
+
+def reply(message_id: int) -> RawSegment:
+    return RawSegment(f'{_REPLY}{int(message_id)}}}}}')
+
+def forward(forward_id: int) -> RawSegment:
+    return RawSegment(f'{_FORWARD}{int(forward_id)}}}}}')
+
+def image(file: str, sub_type: Literal[0, 1] = 0) -> RawSegment:
+    return RawSegment(f'{_IMAGE}{_dumps(file)},"sub_type":{int(sub_type)}}}}}')
+
+def video(file: str) -> RawSegment:
+    return RawSegment(f'{_VIDEO}{_dumps(file)}}}}}')
+
+def file(path: str) -> RawSegment:
+    return RawSegment(f'{_FILE}{_dumps(path)}}}}}')
+
+@lru_cache(maxsize=256)
+def _encode_key(key: str) -> str:
+    return _dumps(key) + ':'
+
+_serializers: dict[type, Callable[[Any], bytes]] = {}
+
+def _model_serializer(cls: type[BaseModel]) -> Callable[[Any], bytes]:
+    serializer = _serializers.get(cls)
+    if serializer is None:
+        serializer = _serializers[cls] = cls.__pydantic_serializer__.to_json
+    return serializer
+
+def encode_value(value: Any) -> str:
+    """
+    编码任意参数值，预编码的消息段原样拼接，pydantic 模型使用按类型缓存的序列化器
+
+    其他序列（如 LazySegmentList）逐项编码，其余类型（datetime、枚举等）交给 pydantic 序列化
+    """
+    cls = type(value)
+    if cls is RawSegment:
+        return value.json
+    if cls is int:
+        return str(value)
+    if cls is str:
+        return _dumps(value)
+    if cls is list or cls is tuple:
+        return '[' + ','.join(map(encode_value, value)) + ']'
+    if isinstance(value, BaseModel):
+        return _model_serializer(cls)(value).decode()
+    if isinstance(value, Mapping):
+        return encode_params(value)  # type: ignore
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes, bytearray)):
+        return '[' + ','.join(map(encode_value, value)) + ']'
+    return to_json(value).decode()
+
+def encode_params(params: Mapping[Any, Any]) -> str:
+    # json 的键只能是字符串，其他类型的键（如 int）转为字符串
+    return '{' + ','.join([
+        _encode_key(key if type(key) is str else str(key)) + encode_value(value) for key, value in params.items()
+    ]) + '}'
+
+def encode_frame(action: str, params_json: str, echo: str) -> str:
+    """用已编码的参数拼接请求帧，参数可以在分配 echo 之前编码"""
+    return f'{{"action":{_dumps(action)},"params":{params_json},"echo":{_dumps(echo)}}}'
+
+def encode_request(action: str, params: Mapping[str, Any], echo: str) -> str:
+    """编码一个 OneBot 请求帧，与 OneBotRequest(...).model_dump_json() 等价"""
+    return encode_frame(action, encode_params(params), echo)
@@ -1,4 +1,5 @@
 from .qq import WsMessage
 from .onebot_request import OneBotRequest, OneBotResponse
+from .frame import WsFrame, WsFrameModel
 
-__all__ = ["WsMessage", "OneBotRequest", "OneBotResponse"]
+__all__ = ["WsMessage", "OneBotRequest", "OneBotResponse", "WsFrame", "WsFrameModel"]
@@ -0,0 +1,9 @@
+from typing import Annotated
+from pydantic import Field, TypeAdapter
+from .qq import WsMessage
+from .onebot_request import OneBotResponse
+
+# ws 上收到的一帧：事件或动作响应
+# 事件在前且按 post_type 判别，响应帧缺少 post_type 会立刻判别失败再尝试 OneBotResponse
+WsFrame = Annotated[WsMessage | OneBotResponse, Field(union_mode='left_to_right')]
+WsFrameModel: TypeAdapter[WsFrame] = TypeAdapter(WsFrame)
@@ -1,10 +1,11 @@
 from typing import Literal, Any
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel
 
 class OneBotRequest(BaseModel):
     action: str
     params: dict[str, Any]
-    echo: UUID4
+    # 每个 bot 连接内唯一的短计数字符串，见 request_manager.generate_echo
+    echo: str
 
     model_config = {"extra": "ignore"}
 
@@ -14,6 +15,8 @@ class OneBotResponse(BaseModel):
     data: Any | None = None
     message: str = ""
     wording: str = ""
-    echo: UUID4
+    echo: str
+    # 协议端不会返回该字段，由 ws 层填入收到响应的 bot
+    self_id: int | None = None
     
     model_config = {"extra": "ignore"}
\ No newline at end of file
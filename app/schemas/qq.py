@@ -1,5 +1,7 @@
-from typing import Literal, Annotated
-from pydantic import BaseModel, Field, field_validator, AnyHttpUrl, TypeAdapter
+from typing import Literal, Annotated, Any, overload
+from collections.abc import Iterator, Sequence
+from pydantic import BaseModel, Field, field_validator, AnyHttpUrl, TypeAdapter, GetCoreSchemaHandler
+from pydantic_core import core_schema
 from datetime import datetime
 
 class OneBotEventBase(BaseModel):
@@ -106,12 +108,74 @@ class ForwardMessageSegment(BaseModel):
 MessageSegment = Annotated[TextMessageSegment | ReplyMessageSegment | ImageMessageSegment | VideoMessageSegment | FileMessageSegment | AtMessageSegment | ForwardMessageSegment, Field(discriminator="type")]
 MessageSegmentModel: TypeAdapter[MessageSegment] = TypeAdapter(MessageSegment)
 
+class LazySegmentList(Sequence[MessageSegment]):
+    """
+    惰性校验的消息段列表
+
+    校验消息时只保存原始数据，某个消息段第一次被访问时才校验为 MessageSegment 并缓存。
+    大多数处理器只读 user_id、raw_message，图片、视频等消息段的 URL 校验就不会发生。
+    注意：非法的消息段在访问时才会抛出 ValidationError。
+    """
+    __slots__ = ('_raw', '_items')
+
+    def __init__(self, raw: Sequence[Any]):
+        self._raw = raw
+        self._items: list[MessageSegment | None] = [None] * len(raw)
+
+    def _segment(self, index: int) -> MessageSegment:
+        item = self._items[index]
+        if item is None:
+            item = self._items[index] = MessageSegmentModel.validate_python(self._raw[index])
+        return item
+
+    @overload
+    def __getitem__(self, index: int) -> MessageSegment: ...
+    @overload
+    def __getitem__(self, index: slice) -> list[MessageSegment]: ...
+    def __getitem__(self, index: int | slice) -> MessageSegment | list[MessageSegment]:
+        if isinstance(index, slice):
+            return [self._segment(i) for i in range(*index.indices(len(self._raw)))]
+        return self._segment(index)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __iter__(self) -> Iterator[MessageSegment]:
+        for i in range(len(self._raw)):
+            yield self._segment(i)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Sequence):
+            return list(self) == list(other)  # type: ignore
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr([item if item is not None else raw for item, raw in zip(self._items, self._raw)])
+
+    def validate(self) -> list[MessageSegment]:
+        """立即校验全部消息段"""
+        return list(self)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        from_raw = core_schema.no_info_after_validator_function(cls, core_schema.list_schema(core_schema.any_schema()))
+        return core_schema.json_or_python_schema(
+            json_schema=from_raw,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_raw]),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                list,
+                return_schema=handler.generate_schema(list[MessageSegment])
+            )
+        )
+
+LazyMessageSegments = Annotated[Sequence[MessageSegment], LazySegmentList]
+
 class MessageBase(OneBotEventBase):
     post_type: Literal['message', 'message_sent'] = 'message'
     user_id: int
     message_id: int
     raw_message: str
-    message: list[MessageSegment]
+    message: LazyMessageSegments
     message_format: Literal['array']
 
 class PrivateMessage(MessageBase):
@@ -0,0 +1,23 @@
+"""
+处理器进程入口：与持有 ws 连接的进程配合使用（EVENT_BUS=multiprocess）
+
+    EVENT_BUS=multiprocess CLUSTER_DIR=/run/helpdesk python -m app.worker
+
+从事件总线接收按 user_id 分到本进程的消息事件并执行处理器；处理器中发出的请求经集群
+（cluster_dir）转发给持有该 bot 连接的进程。
+"""
+import asyncio
+import app.main  # noqa: F401  导入路由与 OneBot 接口模块，注册其中的处理器
+from app.core import cluster, event_manager
+from app.core.config import get_settings
+from app.core.event_bus import LocalEventBus, run_consumer
+from app.core.request_manager import serve_forwarded
+
+async def main():
+    # 本进程只消费事件：收到的事件在本进程分发，不再开启事件总线的监听
+    event_manager.bus = LocalEventBus(event_manager.queue)
+    async with event_manager.lifespan(), cluster.lifespan(serve_forwarded):
+        await run_consumer(get_settings().event_bus_dir, event_manager.queue)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+发送请求编码微基准：对比逐层构造 pydantic 模型再 model_dump_json 与 encoder 直接拼接请求帧的速度
+
+运行: python benchmarks/bench_encode.py [--seconds 0.5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from collections.abc import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.onebot import encoder
+from app.onebot.encoder import encode_request
+from app.schemas import OneBotRequest
+from app.schemas.qq import TextMessageSegment, TextData, ReplyMessageSegment, ReplyData, AtMessageSegment, AtData
+
+TEXT = "您的工单已受理，工程师会尽快联系您。"
+
+def _model_text() -> str:
+    message = [TextMessageSegment(data=TextData(text=TEXT))]
+    return OneBotRequest(action="send_private_msg", params={"user_id": 5079132, "message": message}, echo="1f").model_dump_json()
+
+def _encoder_text() -> str:
+    return encode_request("send_private_msg", {"user_id": 5079132, "message": [encoder.text(TEXT)]}, "1f")
+
+def _model_reply() -> str:
+    message = [
+        ReplyMessageSegment(data=ReplyData(id=1234567)),
+        AtMessageSegment(data=AtData(qq=5079132)),
+        TextMessageSegment(data=TextData(text=TEXT)),
+    ]
+    return OneBotRequest(action="send_group_msg", params={"group_id": 123456, "message": message}, echo="1f").model_dump_json()
+
+def _encoder_reply() -> str:
+    message = [encoder.reply(1234567), encoder.at(5079132), encoder.text(TEXT)]
+    return encode_request("send_group_msg", {"group_id": 123456, "message": message}, "1f")
+
+def _rate(encode: Callable[[], str], seconds: float) -> float:
+    count = 0
+    batch = 200
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(batch):
+            encode()
+        count += batch
+    return count / elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=0.5, help="每个用例的计时时长")
+    ns = parser.parse_args()
+
+    print(f"{'case':<24}{'pydantic/s':>14}{'encoder/s':>14}{'speedup':>10}")
+    for name, model, fast in (("private text", _model_text, _encoder_text), ("group reply+at+text", _model_reply, _encoder_reply)):
+        slow_rate = _rate(model, ns.seconds)
+        fast_rate = _rate(fast, ns.seconds)
+        print(f"{name:<24}{slow_rate:>14,.0f}{fast_rate:>14,.0f}{fast_rate / slow_rate:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+接入吞吐基准：在进程内启动 FastAPI 应用，模拟 N 个 bot 连接 /ws/，
+按给定速率回放 docs/onebot_v11.md 中的协议样例，输出 json 格式的结果：
+每秒处理事件数、从发送到处理器执行的端到端延迟 p50/p99、进程峰值 RSS。
+
+只使用本机回环地址，可离线运行。
+
+运行: python benchmarks/bench_ingest.py --bots 4 --rate 500 --duration 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+from loguru import logger
+from websockets.asyncio.client import connect
+
+from app.core.event_manager import register
+from app.schemas.qq import PrivateMessage, GroupMessage
+from benchmarks.frames import load_samples, render
+
+# 回放的帧类型及其权重
+MIX = {
+    "text": ("私聊消息 接收/纯文本", 50),
+    "image mix": ("私聊消息 接收/图文混排", 15),
+    "group complex mix": ("群聊消息 接收/复杂混排", 20),
+    "forward": ("群聊消息 接收/私聊记录的合并转发", 5),
+    "heartbeat": ("元事件/心跳 间隔ms", 10),
+}
+
+BOT_ID_BASE = 3892215616
+
+sent_at: dict[int, float] = {}
+latencies: list[float] = []
+
+async def _on_message(e: PrivateMessage | GroupMessage):
+    if (start := sent_at.pop(e.message_id, None)) is not None:
+        latencies.append(time.perf_counter() - start)
+
+@register
+async def bench_private_message(e: PrivateMessage):
+    await _on_message(e)
+
+@register
+async def bench_group_message(e: GroupMessage):
+    await _on_message(e)
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def _run_bot(
+    url: str,
+    bot_id: int,
+    samples: dict[str, dict[str, Any]],
+    rate: float,
+    duration: float,
+    message_ids: "itertools.count[int]",
+) -> int:
+    names = list(MIX)
+    weights = [MIX[name][1] for name in names]
+    rng = random.Random(bot_id)
+    sent = 0
+    async with connect(url, max_size=None) as ws:
+        await ws.send(render(samples["元事件/生命周期 连接"], self_id=bot_id, time=int(time.time())))
+        start = time.perf_counter()
+        next_at = start
+        while (now := time.perf_counter()) - start < duration:
+            if rate > 0:
+                # 按绝对时间排程，避免累积漂移
+                next_at += 1 / rate
+                if next_at > now:
+                    await asyncio.sleep(next_at - now)
+            sample = samples[MIX[rng.choices(names, weights)[0]][0]]
+            if sample.get("post_type") == "message":
+                message_id = next(message_ids)
+                frame = render(sample, self_id=bot_id, time=int(time.time()), message_id=message_id)
+                sent_at[message_id] = time.perf_counter()
+            else:
+                frame = render(sample, self_id=bot_id, time=int(time.time()))
+            await ws.send(frame)
+            sent += 1
+            if rate <= 0 and sent % 64 == 0:
+                await asyncio.sleep(0)
+    return sent
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bots", type=int, default=4, help="模拟的 bot 连接数")
+    parser.add_argument("--rate", type=float, default=500, help="每个 bot 每秒发送的帧数，0 表示尽快发送")
+    parser.add_argument("--duration", type=float, default=5, help="发送时长（秒）")
+    parser.add_argument("--drain", type=float, default=10, help="发送结束后等待处理完成的最长时间（秒）")
+    parser.add_argument("--log-level", default="WARNING", help="基准期间 loguru 的输出级别")
+    ns = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=ns.log_level)
+
+    from app.main import app
+
+    samples = load_samples()
+    for name, (key, _) in MIX.items():
+        assert key in samples, f"sample {name!r} ({key}) not found in docs"
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    url = f"ws://127.0.0.1:{port}/ws/"
+
+    message_ids = itertools.count(1)
+    start = time.perf_counter()
+    sent = sum(await asyncio.gather(*(
+        _run_bot(url, BOT_ID_BASE + i, samples, ns.rate, ns.duration, message_ids)
+        for i in range(ns.bots)
+    )))
+    expected = next(message_ids) - 1
+    deadline = time.perf_counter() + ns.drain
+    while len(latencies) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    await serve
+
+    result = {
+        "bots": ns.bots,
+        "rate_per_bot": ns.rate,
+        "duration": ns.duration,
+        "frames_sent": sent,
+        "messages_sent": expected,
+        "messages_handled": len(latencies),
+        "events_per_sec": round(sent / elapsed, 1),
+        "handled_per_sec": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 3),
+            "max": round(max(latencies, default=0) * 1000, 3),
+        },
+        # 客户端与服务端在同一进程内，峰值 RSS 包含两者
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+enhanced_isinstance 微基准：对比改造前的递归实现（baseline_type_check.py）与编译缓存后的检查速度
+
+运行: python benchmarks/bench_type_check.py [--seconds 0.5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any
+from collections.abc import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.utils import enhanced_isinstance
+from app.core.event_manager import EventType
+from app.schemas.qq import PrivateMessage, HeartbeatEvent, HeartbeatStatus
+from app.schemas import OneBotResponse
+from benchmarks import baseline_type_check
+
+def _cases() -> list[tuple[str, Any, Any]]:
+    heartbeat = HeartbeatEvent(time=1746673666, self_id=1, status=HeartbeatStatus(online=True, good=True), interval=30000)
+    response = OneBotResponse.model_construct(status="ok", retcode=0, echo="1")
+    return [
+        ("EventType (HeartbeatEvent)", heartbeat, EventType),
+        ("EventType (OneBotResponse)", response, EventType),
+        ("type[EventType]", PrivateMessage, type[EventType]),
+        ("dict[str, list[int | str] | None]", {"a": [1, "b", 2], "b": None}, dict[str, list[int | str] | None]),
+        ("list[tuple[int, str]]", [(i, str(i)) for i in range(8)], list[tuple[int, str]]),
+    ]
+
+def _rate(check: Callable[[], bool], seconds: float) -> float:
+    count = 0
+    batch = 200
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        for _ in range(batch):
+            check()
+        count += batch
+    return count / elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=0.5, help="每个用例的计时时长")
+    ns = parser.parse_args()
+
+    print(f"{'type hint':<36}{'baseline/s':>16}{'compiled/s':>16}{'speedup':>10}")
+    for name, obj, hint in _cases():
+        assert enhanced_isinstance(obj, hint) and baseline_type_check.enhanced_isinstance(obj, hint)
+        before = _rate(lambda: baseline_type_check.enhanced_isinstance(obj, hint), ns.seconds)
+        after = _rate(lambda: enhanced_isinstance(obj, hint), ns.seconds)
+        print(f"{name:<36}{before:>16,.0f}{after:>16,.0f}{after / before:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
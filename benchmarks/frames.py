@@ -0,0 +1,40 @@
+"""
+从 docs/onebot_v11.md 中提取协议样例，生成基准测试用的 ws 帧
+"""
+import json
+import re
+from pathlib import Path
+from typing import Any
+
+DOC_PATH = Path(__file__).parent.parent / "docs" / "onebot_v11.md"
+
+_HEADING = re.compile(r"^(#{2,3}) (.+)$")
+_JSON_BLOCK = re.compile(r"^```json\n(.*?)^```", re.S | re.M)
+
+def load_samples(path: Path = DOC_PATH) -> dict[str, dict[str, Any]]:
+    """
+    按 "二级标题/三级标题" 返回文档中的 json 样例，同一标题下的多个样例依次追加 #2、#3 后缀
+    """
+    samples: dict[str, dict[str, Any]] = {}
+    section = subsection = ""
+    text = path.read_text(encoding="utf-8")
+    pos = 0
+    for block in _JSON_BLOCK.finditer(text):
+        for line in text[pos:block.start()].splitlines():
+            if m := _HEADING.match(line):
+                if len(m.group(1)) == 2:
+                    section, subsection = m.group(2), ""
+                else:
+                    subsection = m.group(2)
+        pos = block.end()
+        name = f"{section}/{subsection}"
+        key, n = name, 1
+        while key in samples:
+            n += 1
+            key = f"{name}#{n}"
+        samples[key] = json.loads(block.group(1))
+    return samples
+
+def render(sample: dict[str, Any], **fields: Any) -> str:
+    """用给定字段覆盖样例并序列化为一帧文本"""
+    return json.dumps({**sample, **fields}, ensure_ascii=False)
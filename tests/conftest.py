@@ -1,5 +1,11 @@
 import sys
+import pytest
 from pathlib import Path
 
 # 添加项目根目录到Python路径，确保可以导入app模块
 sys.path.insert(0, str(Path(__file__).parent.parent))
+
+@pytest.fixture
+def anyio_backend():
+    # 项目基于 asyncio 运行，异步测试只跑 asyncio 后端
+    return 'asyncio'
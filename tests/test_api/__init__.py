@@ -0,0 +1 @@
+# 使test_api成为一个Python包
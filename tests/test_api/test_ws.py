@@ -0,0 +1,264 @@
+import asyncio
+import pytest
+from app.api.v1.ws import ConnectionManager, BotConnection
+from app.core.config import get_settings
+from app.schemas.qq import HeartbeatEvent, HeartbeatStatus, ConnectEvent
+
+
+class TestConnectionHealth:
+    def test_heartbeat_updates_health(self):
+        manager = ConnectionManager()
+        manager.record_meta_event(1, ConnectEvent(time=1746673610, self_id=1))
+        health = manager.health[1]
+        assert health.interval is None
+        assert health.heartbeats == 0
+
+        last_seen = health.last_seen
+        manager.record_meta_event(1, HeartbeatEvent(
+            time=1746673666,
+            self_id=1,
+            status=HeartbeatStatus(online=True, good=False),
+            interval=30000
+        ))
+        assert health.online is True
+        assert health.good is False
+        assert health.interval == 30000
+        assert health.heartbeats == 1
+        assert health.last_seen >= last_seen
+
+
+class RecordingWebSocket:
+    def __init__(self, fail_after: int | None = None):
+        self.sent: list[str] = []
+        self.fail_after = fail_after
+
+    async def send_text(self, message: str):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise OSError("connection lost")
+        await asyncio.sleep(0)
+        self.sent.append(message)
+
+
+class TestBotConnection:
+    @pytest.mark.anyio
+    async def test_writer_drains_in_batches(self):
+        websocket = RecordingWebSocket()
+        connection = BotConnection(1, websocket, high_water=3)  # type: ignore
+        writer = asyncio.create_task(connection.run_writer())
+        assert [connection.enqueue(str(i)) for i in range(4)] == [True, True, True, False]
+        while connection.outbox:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert websocket.sent == ["0", "1", "2"]
+        assert connection.stats.frames == 3
+        assert connection.stats.batches == 1
+        assert connection.stats.rejected == 1
+        assert connection.stats.max_latency >= connection.stats.avg_latency > 0
+        writer.cancel()
+
+    @pytest.mark.anyio
+    async def test_writer_stops_on_failure(self):
+        websocket = RecordingWebSocket(fail_after=1)
+        connection = BotConnection(1, websocket)  # type: ignore
+        for i in range(3):
+            connection.enqueue(str(i))
+        await asyncio.wait_for(connection.run_writer(), 1)
+        assert websocket.sent == ["0"]
+        assert connection.stats.dropped == 1
+        assert not connection.enqueue("3")
+
+    @pytest.mark.anyio
+    async def test_close_during_send(self):
+        websocket = RecordingWebSocket()
+        connection = BotConnection(1, websocket)  # type: ignore
+        frames = [asyncio.get_running_loop().create_future() for _ in range(3)]
+        for i, written in enumerate(frames):
+            connection.enqueue(str(i), written)
+        writer = asyncio.create_task(connection.run_writer())
+        # 写协程正在写第一帧时关闭连接，剩余的帧被丢弃，写协程正常结束
+        await asyncio.sleep(0)
+        connection.close()
+        await asyncio.wait_for(writer, 1)
+        assert websocket.sent == ["0"]
+        assert [written.result() for written in frames] == [True, False, False]
+        assert connection.stats.dropped == 2
+
+    @pytest.mark.anyio
+    async def test_take_over_during_send(self):
+        old_socket, new_socket = RecordingWebSocket(), RecordingWebSocket()
+        old = BotConnection(1, old_socket)  # type: ignore
+        new = BotConnection(1, new_socket)  # type: ignore
+        for i in range(3):
+            old.enqueue(str(i))
+        old_writer = asyncio.create_task(old.run_writer())
+        await asyncio.sleep(0)
+        assert new.take_over(old) == 2
+        await asyncio.wait_for(old_writer, 1)
+        assert old_socket.sent == ["0"]
+        new_writer = asyncio.create_task(new.run_writer())
+        while new.outbox:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert new_socket.sent == ["1", "2"]
+        new_writer.cancel()
+
+
+class StalledWebSocket:
+    async def send_text(self, message: str):
+        await asyncio.Event().wait()
+
+
+class TestBroadcast:
+    @pytest.mark.anyio
+    async def test_per_bot_results(self):
+        manager = ConnectionManager()
+        sockets = {1: RecordingWebSocket(), 2: RecordingWebSocket(fail_after=0), 3: StalledWebSocket(), 4: RecordingWebSocket()}
+        for bot_id, websocket in sockets.items():
+            manager.active_connections[bot_id] = BotConnection(bot_id, websocket)  # type: ignore
+        writers = [asyncio.create_task(connection.run_writer()) for connection in manager.active_connections.values()]
+        # 没有写协程的连接：帧一直留在发送队列里
+        idle = manager.active_connections[5] = BotConnection(5, RecordingWebSocket())  # type: ignore
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await manager.broadcast(ConnectEvent(time=1746673610, self_id=0), timeout=0.1)
+        # 一个 bot 失败或卡住不影响其余 bot，总耗时约为单次超时
+        # 3 的帧卡在写入中，结果未知；5 的帧超时后被撤回，之后不会再发出
+        assert results == {1: True, 2: False, 3: None, 4: True, 5: False}
+        assert not idle.outbox
+        assert loop.time() - start < 0.5
+        assert sockets[1].sent == sockets[4].sent == [ConnectEvent(time=1746673610, self_id=0).model_dump_json()]  # type: ignore
+        for writer in writers:
+            writer.cancel()
+
+
+class HandshakeWebSocket:
+    """只用于握手的假连接：first_frame 为 None 时永远收不到首帧"""
+
+    def __init__(self, first_frame: str | None, headers: dict[str, str] | None = None):
+        self.first_frame = first_frame
+        self.headers = headers or {}
+        self.accepted = False
+        self.close_code: int | None = None
+
+    async def accept(self):
+        self.accepted = True
+
+    async def receive(self):
+        if self.first_frame is None:
+            await asyncio.Event().wait()
+        return {"type": "websocket.receive", "text": self.first_frame}
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+def connect_frame(bot_id: int) -> str:
+    return ConnectEvent(time=1746673610, self_id=bot_id).model_dump_json()
+
+
+class TestAdmission:
+    @pytest.fixture(autouse=True)
+    def limits(self, monkeypatch: pytest.MonkeyPatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "ws_max_connections", 2)
+        monkeypatch.setattr(settings, "ws_max_handshakes", 1)
+        monkeypatch.setattr(settings, "ws_handshake_timeout", 0.05)
+
+    @pytest.mark.anyio
+    async def test_limits(self):
+        manager = ConnectionManager()
+        # 握手中的连接占满握手名额，新连接被直接拒绝
+        stalled = HandshakeWebSocket(None)
+        pending = asyncio.create_task(manager.connect(stalled))  # type: ignore
+        await asyncio.sleep(0)
+        rejected = HandshakeWebSocket(connect_frame(1))
+        assert await manager.connect(rejected) is None  # type: ignore
+        # 先 accept 再关闭，客户端才能收到 1013 而不是 HTTP 403
+        assert rejected.accepted and rejected.close_code == 1013
+        # 握手超时的连接被关闭
+        assert await pending is None
+        assert stalled.close_code is not None
+
+        for bot_id in (1, 2):
+            assert await manager.connect(HandshakeWebSocket(connect_frame(bot_id))) is not None  # type: ignore
+        full = HandshakeWebSocket(connect_frame(3))
+        assert await manager.connect(full) is None  # type: ignore
+        assert full.accepted and full.close_code == 1013
+        assert manager.admission.accepted == 2
+        assert (manager.admission.rejected_handshakes, manager.admission.rejected_full, manager.admission.failed_handshakes) == (1, 1, 1)
+
+    @pytest.mark.anyio
+    async def test_reconnect_is_not_counted_against_limit(self):
+        manager = ConnectionManager()
+        for bot_id in (1, 2):
+            assert await manager.connect(HandshakeWebSocket(connect_frame(bot_id))) is not None  # type: ignore
+        # 已连接的 bot 重连替换自己的连接，不受连接数上限影响
+        again = HandshakeWebSocket(connect_frame(2), {"x-self-id": "2"})
+        assert await manager.connect(again) is not None  # type: ignore
+        assert again.close_code is None
+        assert manager.admission.replaced == 1
+        # 请求头冒充已连接的 bot 也不能多占一个名额
+        spoofed = HandshakeWebSocket(connect_frame(3), {"x-self-id": "1"})
+        assert await manager.connect(spoofed) is None  # type: ignore
+        assert spoofed.close_code == 1013
+        assert set(manager.active_connections) == {1, 2}
+
+    @pytest.mark.anyio
+    async def test_reconnect_replaces_old_connection(self):
+        manager = ConnectionManager()
+        old_socket = HandshakeWebSocket(connect_frame(1))
+        connected = await manager.connect(old_socket)  # type: ignore
+        assert connected is not None
+        old, _ = connected
+        old.enqueue("unsent")
+
+        connected = await manager.connect(HandshakeWebSocket(connect_frame(1)))  # type: ignore
+        assert connected is not None
+        new, _ = connected
+        assert manager.active_connections[1] is new
+        assert old.closed and old_socket.close_code is not None
+        assert [message for message, _, _ in new.outbox] == ["unsent"]
+        assert manager.admission.replaced == 1
+
+        # 旧连接的读取循环退出时不能移除新连接
+        await manager.disconnect(1, old)
+        assert manager.active_connections[1] is new
+        await manager.disconnect(1, new)
+        assert 1 not in manager.active_connections
+
+
+class TestLiveness:
+    @pytest.mark.anyio
+    async def test_missed_heartbeats_evict(self, monkeypatch: pytest.MonkeyPatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "heartbeat_check_interval", 0.01)
+        manager = ConnectionManager()
+        removed: list[int] = []
+        manager.disconnect_listeners.append(removed.append)
+        connected = await manager.connect(HandshakeWebSocket(connect_frame(1)))  # type: ignore
+        assert connected is not None
+        connection, _ = connected
+        manager.record_meta_event(1, HeartbeatEvent(
+            time=1746673666, self_id=1, status=HeartbeatStatus(online=True, good=True), interval=40
+        ))
+        health = manager.health[1]
+
+        watchdog = asyncio.create_task(manager.watch(connection))
+        await asyncio.sleep(0.08)
+        assert health.state == "suspect"
+        assert manager.is_suspect(1)
+        await asyncio.wait_for(watchdog, 1)
+        assert health.state == "dead"
+        assert connection.closed
+        assert manager.evicted == 1
+
+        await manager.disconnect(1, connection)
+        assert removed == [1]
+
+    def test_heartbeat_revives_suspect(self):
+        manager = ConnectionManager()
+        manager.record_meta_event(1, ConnectEvent(time=1746673610, self_id=1))
+        manager.health[1].state = "suspect"
+        manager.record_meta_event(1, ConnectEvent(time=1746673610, self_id=1))
+        assert not manager.is_suspect(1)
@@ -0,0 +1,55 @@
+import json
+import pytest
+from pydantic import ValidationError
+from app.schemas import OneBotResponse, WsFrameModel
+from app.schemas.qq import HeartbeatEvent, GroupMessage
+
+
+class TestWsFrame:
+    def test_event_frame(self):
+        frame = json.dumps({
+            "time": 1746673666,
+            "self_id": 3892215616,
+            "post_type": "meta_event",
+            "meta_event_type": "heartbeat",
+            "status": {"online": True, "good": True},
+            "interval": 30000
+        })
+        event = WsFrameModel.validate_json(frame)
+        assert isinstance(event, HeartbeatEvent)
+        assert event.interval == 30000
+
+        frame = json.dumps({
+            "self_id": 3892215616,
+            "user_id": 5079132,
+            "time": 1746673640,
+            "message_id": 2096329721,
+            "message_type": "group",
+            "raw_message": "test",
+            "message": [{"type": "text", "data": {"text": "test"}}],
+            "message_format": "array",
+            "post_type": "message",
+            "group_id": 757951413
+        }, ensure_ascii=False).encode()
+        event = WsFrameModel.validate_json(frame)
+        assert isinstance(event, GroupMessage)
+        assert event.group_id == 757951413
+
+    def test_response_frame(self):
+        frame = json.dumps({
+            "status": "ok",
+            "retcode": 0,
+            "data": {"message_id": 123039305},
+            "message": "",
+            "wording": "",
+            "echo": "0a1f1ab4-3a0b-4ef4-9a4e-4f3c3b3b4b7e"
+        })
+        response = WsFrameModel.validate_json(frame)
+        assert isinstance(response, OneBotResponse)
+        assert response.data == {"message_id": 123039305}
+
+    def test_invalid_frame(self):
+        with pytest.raises(ValidationError):
+            WsFrameModel.validate_json("not json")
+        with pytest.raises(ValidationError):
+            WsFrameModel.validate_json(json.dumps({"post_type": "notice", "time": 1746673640, "self_id": 1}))
@@ -15,6 +15,7 @@ from app.schemas.qq import (
     FileMessageSegment,
     AtMessageSegment,
     ForwardMessageSegment,
+    TextData,
     WsMessageModel
 )
 
@@ -418,6 +419,41 @@ class TestMessage:
         assert message.message[4].data.file == "E8C195761CEDA1D66763414CB8EE494E.png"
 
 
+class TestLazySegments:
+    json_data: dict[str, Any] = {
+        "self_id": 3892215616,
+        "user_id": 5079132,
+        "time": 1746673640,
+        "message_id": 1136053690,
+        "message_type": "private",
+        "raw_message": "哈哈[CQ:image,file=a.png]",
+        "message": [
+            {"type": "text", "data": {"text": "哈哈"}},
+            {"type": "image", "data": {"file": "a.png", "sub_type": 0, "url": "not a url", "file_size": None}}
+        ],
+        "message_format": "array",
+        "post_type": "message",
+        "target_id": 5079132
+    }
+
+    def test_segments_validated_on_access(self):
+        message = PrivateMessage.model_validate(self.json_data)
+        # 非法的图片 URL 不影响消息本身的校验
+        assert message.raw_message == "哈哈[CQ:image,file=a.png]"
+        assert len(message.message) == 2
+        assert isinstance(message.message[0], TextMessageSegment)
+        assert message.message[0] is message.message[0]
+        with pytest.raises(ValidationError):
+            message.message[1]
+
+    def test_dump_and_compare(self):
+        json_data = dict(self.json_data, message=[self.json_data["message"][0]])
+        message = PrivateMessage.model_validate(json_data)
+        assert message.message == [TextMessageSegment(data=TextData(text="哈哈"))]
+        assert message.model_dump()["message"] == [{"type": "text", "data": {"text": "哈哈"}}]
+        assert PrivateMessage.model_validate_json(message.model_dump_json()).message == message.message
+
+
 class TestWsMessage:
     def test_ws_message_meta_event(self):
         # 测试元事件
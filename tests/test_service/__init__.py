@@ -0,0 +1 @@
+# 使test_service成为一个Python包
@@ -0,0 +1,14 @@
+import pytest
+from app.core import request_manager
+from app.core.rate_limiter import RateLimiter
+from tests.test_service.fake_bot import FakeBot
+
+
+@pytest.fixture
+def fake_bot(monkeypatch: pytest.MonkeyPatch) -> FakeBot:
+    bot = FakeBot(silent_actions=["never_reply"])
+    monkeypatch.setattr(request_manager.manager, "send_message", bot.send_message)
+    monkeypatch.setattr(request_manager.manager, "send_messages", bot.send_messages)
+    # 默认不限流，限流行为在 test_rate_limiter 中单独测试
+    monkeypatch.setattr(request_manager, "limiter", RateLimiter())
+    return bot
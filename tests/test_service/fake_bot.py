@@ -0,0 +1,42 @@
+import json
+import asyncio
+from collections.abc import Sequence
+from typing import Any
+from app.core.request_manager import handle_response
+from app.schemas import OneBotResponse
+
+
+class FakeBot:
+    """替代 ws 连接：记录收到的帧，并按 action 决定是否回复"""
+
+    def __init__(self, silent_actions: Sequence[str] = ()):
+        self.frames: list[dict[str, Any]] = []
+        self.silent_actions = set(silent_actions)
+        # 按 action 指定响应的 data，未指定时回显 action
+        self.data: dict[str, Any] = {}
+        # 发送总是失败的 bot
+        self.offline: set[int] = set()
+        # 每一帧由哪个 bot 发出
+        self.senders: list[int] = []
+
+    def reply(self, bot_id: int, frame: dict[str, Any]):
+        data = self.data.get(frame["action"], {"action": frame["action"]})
+        response = OneBotResponse(status="ok", retcode=0, data=data, echo=frame["echo"], self_id=bot_id)
+        asyncio.get_running_loop().create_task(handle_response(response))
+
+    async def send_message(self, bot_id: int, message: str, written: asyncio.Future[bool] | None = None) -> bool:
+        sent = await self.send_messages(bot_id, [message]) == 1
+        if sent and written is not None:
+            written.set_result(True)
+        return sent
+
+    async def send_messages(self, bot_id: int, messages: Sequence[str]) -> int:
+        if bot_id in self.offline:
+            return 0
+        for message in messages:
+            frame = json.loads(message)
+            self.frames.append(frame)
+            self.senders.append(bot_id)
+            if frame["action"] not in self.silent_actions:
+                self.reply(bot_id, frame)
+        return len(messages)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from app.api.v1.ws import BotConnection
+from app.core import request_manager
+from app.core.rate_limiter import RateLimiter
+from app.schemas import OneBotResponse
+from app.core.bot_router import BotRouter
+from tests.test_service.fake_bot import FakeBot
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def bots(monkeypatch: pytest.MonkeyPatch) -> dict[int, SimpleNamespace]:
+    connections = {bot_id: SimpleNamespace(closed=False) for bot_id in (1, 2, 3)}
+    monkeypatch.setattr(request_manager.manager, "active_connections", connections)
+    return connections
+
+
+class TestChoose:
+    def test_round_robin(self, bots: dict[int, SimpleNamespace]):
+        router = BotRouter("round_robin")
+        assert [router.choose() for _ in range(4)] == [2, 3, 1, 2]
+        bots[3].closed = True
+        assert {router.choose() for _ in range(4)} == {1, 2}
+
+    def test_least_inflight(self, bots: dict[int, SimpleNamespace], monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(request_manager, "pending_requests", {1: {"1": None, "2": None}, 2: {"1": None}})
+        assert BotRouter().choose() == 3
+        assert BotRouter().choose(exclude=[3]) == 2
+
+    def test_avoid_suspect(self, bots: dict[int, SimpleNamespace], monkeypatch: pytest.MonkeyPatch):
+        health = {bot_id: SimpleNamespace(state="alive") for bot_id in bots}
+        monkeypatch.setattr(request_manager.manager, "health", health)
+        health[1].state = health[2].state = "suspect"
+        assert BotRouter().candidates() == [3]
+        # 全部可疑时仍然可用
+        health[3].state = "suspect"
+        assert BotRouter().candidates() == [1, 2, 3]
+
+    def test_sticky(self, bots: dict[int, SimpleNamespace]):
+        router = BotRouter("sticky")
+        first = router.choose(user_id=42)
+        assert all(router.choose(user_id=42) == first for _ in range(3))
+        del bots[first]  # type: ignore
+        second = router.choose(user_id=42)
+        assert second != first
+        assert router.choose(user_id=42) == second
+
+    def test_sticky_is_bounded(self, bots: dict[int, SimpleNamespace]):
+        router = BotRouter("sticky", sticky_size=2)
+        for user_id in range(5):
+            router.choose(user_id=user_id)
+        assert list(router._sticky) == [3, 4]
+
+        bound = router.choose(user_id=4)
+        router.forget(bound)
+        assert 4 not in router._sticky
+
+        router = BotRouter("sticky", sticky_ttl=0)
+        router.choose(user_id=1)
+        assert router._sticky_bot(1) is None
+
+
+class TestFailover:
+    async def test_retry_on_another_bot(self, fake_bot: FakeBot, bots: dict[int, SimpleNamespace]):
+        fake_bot.offline = {1, 2}
+        response = await BotRouter("round_robin").send_request("get_login_info", {}, retries=2)
+        assert response is not None
+        assert fake_bot.senders == [3]
+
+    async def test_gives_up_after_retries(self, fake_bot: FakeBot, bots: dict[int, SimpleNamespace]):
+        fake_bot.offline = {1, 2, 3}
+        assert await BotRouter().send_request("get_login_info", {}, retries=1) is None
+        assert not request_manager.pending_requests
+
+    async def test_retry_frames_dropped_on_disconnect(self, monkeypatch: pytest.MonkeyPatch):
+        manager = request_manager.manager
+        connections = {bot_id: BotConnection(bot_id, ClosableWebSocket()) for bot_id in (1, 2)}  # type: ignore
+        monkeypatch.setattr(manager, "active_connections", dict(connections))
+        monkeypatch.setattr(manager, "health", {})
+        monkeypatch.setattr(request_manager, "limiter", RateLimiter())
+        task = asyncio.create_task(BotRouter().send_request("get_status", {}, timeout=1))
+        await asyncio.sleep(0)
+        first = next(bot_id for bot_id, connection in connections.items() if connection.outbox)
+
+        # 写协程还没写出帧连接就断开了，对端没有收到，应当换 bot 重试
+        await manager.disconnect(first)
+        await asyncio.sleep(0)
+        other = connections[3 - first]
+        assert len(other.outbox) == 1
+        frame = json.loads(other.outbox[0][0])
+        await request_manager.handle_response(
+            OneBotResponse(status="ok", retcode=0, data=None, echo=frame["echo"], self_id=3 - first)
+        )
+        response = await asyncio.wait_for(task, 1)
+        assert response is not None and response.self_id == 3 - first
+
+
+class ClosableWebSocket:
+    async def close(self, code: int = 1000):
+        pass
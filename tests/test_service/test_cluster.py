@@ -0,0 +1,75 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Any
+import pytest
+from app.core.cluster import ClusterNode, NotForwarded
+from app.schemas import OneBotResponse
+
+pytestmark = pytest.mark.anyio
+
+
+async def owner_handler(bot_id: int, action: str, params: dict[str, Any], timeout: float, priority: Any):
+    if action == "not_sent":
+        return False, None
+    if action == "broken":
+        raise RuntimeError(action)
+    data = {"action": action, "params": params, "priority": priority}
+    return True, OneBotResponse(status="ok", retcode=0, data=data, echo="1", self_id=bot_id)
+
+
+async def unused_handler(*_: Any):
+    raise AssertionError("request should be forwarded")
+
+
+@pytest.fixture
+async def nodes(tmp_path: Path):
+    owner = ClusterNode(tmp_path, owner_handler, name="a")
+    caller = ClusterNode(tmp_path, unused_handler, name="b")
+    await owner.start()
+    await caller.start()
+    yield owner, caller
+    await caller.stop()
+    await owner.stop()
+
+
+class TestClusterNode:
+    async def test_forward_to_owner(self, nodes: tuple[ClusterNode, ClusterNode]):
+        owner, caller = nodes
+        owner.claim(1)
+        assert caller.owner(1) == owner.path
+        response = await caller.forward(1, "get_login_info", '{"no_cache":true}', 5, "bulk")
+        assert response is not None
+        assert response.self_id == 1
+        assert response.data == {"action": "get_login_info", "params": {"no_cache": True}, "priority": "bulk"}
+
+        with pytest.raises(NotForwarded):
+            await caller.forward(1, "not_sent", '{}', 5, "interactive")
+        with pytest.raises(NotForwarded):
+            await caller.forward(2, "get_login_info", '{}', 5, "interactive")
+
+    async def test_owner_failure_replies_not_sent(self, nodes: tuple[ClusterNode, ClusterNode]):
+        owner, caller = nodes
+        owner.claim(1)
+        # 所属 worker 执行出错时立即得到答复，而不是等到超时
+        with pytest.raises(NotForwarded):
+            await asyncio.wait_for(caller.forward(1, "broken", '{}', 30, "interactive"), 1)
+
+    async def test_claim_moves_and_release(self, nodes: tuple[ClusterNode, ClusterNode]):
+        owner, caller = nodes
+        owner.claim(1)
+        caller.claim(1)
+        assert owner.owner(1) == caller.path
+        # 旧的所属 worker 断开时不能删掉新的登记
+        owner.release(1)
+        assert owner.owner(1) == caller.path
+        caller.release(1)
+        assert owner.owner(1) is None
+
+    async def test_dead_owner_claim_is_dropped(self, nodes: tuple[ClusterNode, ClusterNode], tmp_path: Path):
+        _, caller = nodes
+        dead = str(tmp_path / "dead.sock")
+        os.symlink(dead, tmp_path / "bots" / "3")
+        with pytest.raises(NotForwarded):
+            await caller.forward(3, "get_login_info", '{}', 5, "interactive")
+        assert caller.owner(3) is None
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timezone
+from app.onebot import encoder
+from app.onebot.encoder import encode_request
+from app.schemas import OneBotRequest
+from app.schemas.qq import (
+    LazySegmentList,
+    MessageSegmentModel, TextMessageSegment, TextData, AtMessageSegment, AtData,
+    ImageMessageSegment, ImageData, ReplyMessageSegment, ReplyData
+)
+
+
+def test_segments_match_schema():
+    cases = [
+        (encoder.text('你好 "quoted"\n'), TextMessageSegment(data=TextData(text='你好 "quoted"\n'))),
+        (encoder.at(123), AtMessageSegment(data=AtData(qq=123))),
+        (encoder.at("all"), AtMessageSegment(data=AtData(qq="all"))),
+        (encoder.reply(42), ReplyMessageSegment(data=ReplyData(id=42))),
+    ]
+    for raw, model in cases:
+        assert MessageSegmentModel.validate_json(raw.json) == model
+    assert json.loads(encoder.image("file://a.jpg").json) == {"type": "image", "data": {"file": "file://a.jpg", "sub_type": 0}}
+
+
+def test_request_matches_model_dump():
+    image = ImageMessageSegment(data=ImageData(file="a.jpg", sub_type=1, url=None, file_size=None))
+    params = {"user_id": 1, "message": [TextMessageSegment(data=TextData(text="文本")), image], "auto_escape": False}
+    expected = OneBotRequest(action="send_private_msg", params=params, echo="1f").model_dump_json()
+    assert encode_request("send_private_msg", params, "1f") == expected
+
+    mixed = {"group_id": 2, "message": [encoder.reply(7), encoder.text("hi")], "extra": {"a": [1, None]}}
+    assert json.loads(encode_request("send_group_msg", mixed, "2")) == {
+        "action": "send_group_msg",
+        "params": {
+            "group_id": 2,
+            "message": [{"type": "reply", "data": {"id": 7}}, {"type": "text", "data": {"text": "hi"}}],
+            "extra": {"a": [1, None]},
+        },
+        "echo": "2",
+    }
+
+
+def test_other_values():
+    raw = [{"type": "text", "data": {"text": "hi"}}, {"type": "at", "data": {"qq": 1}}]
+    # 事件里的消息原样回发
+    assert json.loads(encoder.encode_value(LazySegmentList(raw))) == raw
+    assert encoder.encode_value(datetime(2024, 1, 2, tzinfo=timezone.utc)) == '"2024-01-02T00:00:00Z"'
+    assert json.loads(encoder.encode_params({1: "x", "flag": True, "none": None})) == {"1": "x", "flag": True, "none": None}
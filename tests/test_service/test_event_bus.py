@@ -0,0 +1,79 @@
+import asyncio
+import os
+from pathlib import Path
+import pytest
+from app.core.event_bus import EventBus, MultiprocessEventBus, run_consumer
+from app.core.event_queue import ShardedEventQueue
+from app.schemas.qq import PrivateMessage, ConnectEvent
+
+pytestmark = pytest.mark.anyio
+
+
+def private_message(user_id: int) -> PrivateMessage:
+    return PrivateMessage(
+        time=1746673610, self_id=1, user_id=user_id, message_id=user_id, raw_message="hi",
+        message=[{"type": "text", "data": {"text": "hi"}}], message_format="array", target_id=1  # type: ignore
+    )
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_bus_must_implement_publish():
+    class Incomplete(EventBus):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()  # type: ignore
+
+
+class TestMultiprocessEventBus:
+    async def test_partition_by_user(self, tmp_path: Path):
+        local: ShardedEventQueue = ShardedEventQueue()
+        bus = MultiprocessEventBus(local, tmp_path, name="a")
+        remotes: list[ShardedEventQueue] = [ShardedEventQueue(), ShardedEventQueue()]
+        async with bus.lifespan():
+            # 没有处理器进程时在本进程处理
+            await bus.publish(private_message(1))
+            assert local.qsize() == 1
+
+            consumers = []
+            for remote in remotes:
+                consumers.append(asyncio.create_task(run_consumer(tmp_path, remote, retry=0.01)))
+                count = len(consumers)
+                await wait_for(lambda: len(bus.consumers) == count)
+
+            for user_id in (10, 11, 12, 10):
+                message = private_message(user_id)
+                await bus.publish(message, message.model_dump_json())
+            # 没有 user_id 的事件不分区
+            await bus.publish(ConnectEvent(time=1746673610, self_id=1))
+            await wait_for(lambda: remotes[0].qsize() + remotes[1].qsize() == 4)
+
+            assert local.qsize() == 2
+            assert [(await remotes[0].get()).user_id for _ in range(3)] == [10, 12, 10]  # type: ignore
+            assert (await remotes[1].get()).user_id == 11  # type: ignore
+            for consumer in consumers:
+                consumer.cancel()
+
+    async def test_one_socket_per_worker(self, tmp_path: Path):
+        first = MultiprocessEventBus(ShardedEventQueue(), tmp_path, name="a")
+        second = MultiprocessEventBus(ShardedEventQueue(), tmp_path, name="b")
+        remote: ShardedEventQueue = ShardedEventQueue()
+        async with first.lifespan():
+            async with second.lifespan():
+                consumer = asyncio.create_task(run_consumer(tmp_path, remote, retry=0.01))
+                # 处理器进程连上所有持有 ws 连接的 worker
+                await wait_for(lambda: len(first.consumers) == len(second.consumers) == 1)
+                await first.publish(private_message(1))
+                await second.publish(private_message(2))
+                await wait_for(lambda: remote.qsize() == 2)
+            # 一个 worker 退出不会删除其他 worker 的 socket
+            assert os.path.exists(first.path) and not os.path.exists(second.path)
+            await first.publish(private_message(3))
+            await wait_for(lambda: remote.qsize() == 3)
+            consumer.cancel()
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import pytest
+import anyio
+from app.core import event_manager, request_manager
+from app.core.event_bus import LocalEventBus
+from app.core.event_queue import ShardedEventQueue
+from app.core.rate_limiter import RateLimiter
+from app.core.event_manager import register, publish, get_handler_stats
+from app.schemas import OneBotResponse
+from app.schemas.qq import (
+    PrivateMessage,
+    GroupMessage,
+    HeartbeatEvent
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_handlers():
+    """备份并还原全局的处理器注册表"""
+    handlers = {k: list(v) for k, v in event_manager.handlers.items()}
+    index = {k: list(v) for k, v in event_manager._handler_index.items()}
+    event_manager.handlers.clear()
+    event_manager._handler_index.clear()
+    event_manager._dispatch_cache.clear()
+    yield
+    event_manager.handlers.clear()
+    event_manager.handlers.update(handlers)
+    event_manager._handler_index.clear()
+    event_manager._handler_index.update(index)
+    event_manager._dispatch_cache.clear()
+
+
+def resolve(cls: type):
+    return tuple(spec.func for spec in event_manager._resolve_handlers(cls))
+
+
+def private_message(message_id: int) -> PrivateMessage:
+    return PrivateMessage.model_validate({
+        "self_id": 3892215616,
+        "user_id": 5079132,
+        "time": 1746673640,
+        "message_id": message_id,
+        "message_type": "private",
+        "raw_message": "你好",
+        "message": [{"type": "text", "data": {"text": "你好"}}],
+        "message_format": "array",
+        "post_type": "message",
+        "target_id": 5079132
+    })
+
+
+class TestDispatchTable:
+    def test_resolve_by_concrete_class(self):
+        @register
+        async def on_private(e: PrivateMessage): ...
+
+        @register
+        async def on_group(e: GroupMessage): ...
+
+        @register
+        async def on_response(e: OneBotResponse): ...
+
+        assert resolve(PrivateMessage) == (on_private,)
+        assert resolve(GroupMessage) == (on_group,)
+        assert resolve(OneBotResponse) == (on_response,)
+        assert resolve(HeartbeatEvent) == ()
+
+    def test_resolve_through_mro(self):
+        class FriendMessage(PrivateMessage):
+            pass
+
+        @register
+        async def on_private(e: PrivateMessage): ...
+
+        @register
+        async def on_friend(e: FriendMessage): ...
+
+        # 子类事件同时命中父类的处理器，且保持注册顺序
+        assert resolve(FriendMessage) == (on_private, on_friend)
+        assert resolve(PrivateMessage) == (on_private,)
+
+    def test_register_invalidates_cache(self):
+        @register
+        async def first(e: PrivateMessage): ...
+
+        assert resolve(PrivateMessage) == (first,)
+
+        @register
+        async def second(e: PrivateMessage): ...
+
+        assert resolve(PrivateMessage) == (first, second)
+
+
+@pytest.mark.anyio
+class TestWorkerPool:
+    async def test_concurrency_cap(self):
+        running = 0
+        peak = 0
+        seen: list[int] = []
+
+        @register(concurrency=2)
+        async def slow(e: PrivateMessage):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await anyio.sleep(0.01)
+            running -= 1
+            seen.append(e.message_id)
+
+        async with event_manager.lifespan():
+            for i in range(6):
+                await publish(private_message(i))
+            with anyio.fail_after(1):
+                while len(seen) < 6:
+                    await anyio.sleep(0.01)
+
+        assert peak == 2
+        assert sorted(seen) == list(range(6))
+        stats = get_handler_stats()[f"{slow.__module__}.{slow.__qualname__}"]
+        assert stats.dispatched == stats.completed == 6
+        assert stats.max_wait > 0
+
+    async def test_failure_does_not_stop_pool(self):
+        seen: list[int] = []
+
+        @register(inline=True)
+        async def broken(e: PrivateMessage):
+            raise ValueError(e.message_id)
+
+        @register
+        async def ok(e: PrivateMessage):
+            seen.append(e.message_id)
+
+        async with event_manager.lifespan():
+            await publish(private_message(1))
+            await publish(private_message(2))
+            with anyio.fail_after(1):
+                while len(seen) < 2:
+                    await anyio.sleep(0.01)
+
+        assert seen == [1, 2]
+        assert get_handler_stats()[f"{broken.__module__}.{broken.__qualname__}"].failed == 2
+
+    async def test_backlog_is_bounded(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(event_manager._settings, "event_queue_size", 2)
+        monkeypatch.setattr(event_manager._settings, "event_queue_overflow", "drop_oldest")
+        release = anyio.Event()
+        seen: list[int] = []
+
+        @register(concurrency=1)
+        async def slow(e: PrivateMessage):
+            await release.wait()
+            seen.append(e.message_id)
+
+        async with event_manager.lifespan():
+            for i in range(5):
+                await publish(private_message(i))
+            with anyio.fail_after(1):
+                while event_manager.queue.qsize():
+                    await anyio.sleep(0.01)
+            release.set()
+            with anyio.fail_after(1):
+                while len(seen) < 3:
+                    await anyio.sleep(0.01)
+
+        # 0 正在执行，积压只保留最新的 2 个
+        assert seen == [0, 3, 4]
+        assert get_handler_stats()[f"{slow.__module__}.{slow.__qualname__}"].dropped == 2
+
+    async def test_full_backlog_blocks_dispatch(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(event_manager._settings, "event_queue_size", 1)
+        monkeypatch.setattr(event_manager._settings, "event_queue_overflow", "block")
+        release = anyio.Event()
+        seen: list[int] = []
+
+        @register(concurrency=1)
+        async def slow(e: PrivateMessage):
+            await release.wait()
+            seen.append(e.message_id)
+
+        async with event_manager.lifespan():
+            for i in range(3):
+                await publish(private_message(i))
+            await anyio.sleep(0.05)
+            # 0 执行中、1 积压，分发循环拿着 2 等待积压空出位置
+            spec, = event_manager._resolve_handlers(PrivateMessage)
+            assert len(spec.backlog) == 1 and spec.putters
+            release.set()
+            with anyio.fail_after(1):
+                while len(seen) < 3:
+                    await anyio.sleep(0.01)
+
+        assert seen == [0, 1, 2]
+
+
+def response(echo: str) -> OneBotResponse:
+    return OneBotResponse(status="ok", retcode=0, data=None, echo=echo, self_id=3892215616)
+
+
+@pytest.mark.anyio
+class TestResponses:
+    async def test_responses_skip_full_queue(self, monkeypatch: pytest.MonkeyPatch):
+        queue = ShardedEventQueue(1, "drop_oldest")
+        monkeypatch.setattr(event_manager, "queue", queue)
+        monkeypatch.setattr(event_manager, "bus", LocalEventBus(queue))
+        matched: list[str | None] = []
+
+        @register(inline=True)
+        async def on_response(e: OneBotResponse):
+            matched.append(e.echo)
+
+        # 没有分发循环在消费，分片已满；响应既不能被挤掉也不能挤掉事件
+        await publish(private_message(1))
+        await publish(response("1"))
+        await publish(response("2"))
+        assert matched == ["1", "2"]
+        assert queue.qsize() == 1 and not queue.dropped
+
+    async def test_handlers_awaiting_replies_do_not_deadlock(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(event_manager._settings, "event_workers", 2)
+        register(inline=True)(request_manager.handle_response)
+
+        async def send_message(bot_id: int, message: str, written: asyncio.Future[bool] | None = None) -> bool:
+            # 与 ws 读取循环一样，对端的响应经 publish 进入
+            echo = json.loads(message)["echo"]
+            asyncio.get_running_loop().call_soon(asyncio.ensure_future, publish(response(echo)))
+            return True
+
+        monkeypatch.setattr(request_manager.manager, "send_message", send_message)
+        monkeypatch.setattr(request_manager, "limiter", RateLimiter())
+        replies: list[OneBotResponse | None] = []
+
+        @register
+        async def ask(e: PrivateMessage):
+            replies.append(await request_manager.send_request(3892215616, "get_status", {}, timeout=1))
+
+        async with event_manager.lifespan():
+            # 突发的事件数远多于工作协程，处理器都在等待响应
+            for i in range(10):
+                await publish(private_message(i))
+            with anyio.fail_after(2):
+                while len(replies) < 10:
+                    await anyio.sleep(0.01)
+
+        assert all(reply is not None for reply in replies)
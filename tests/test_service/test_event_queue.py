@@ -0,0 +1,59 @@
+import pytest
+import anyio
+from app.core.event_queue import ShardedEventQueue
+from app.schemas.qq import HeartbeatEvent, HeartbeatStatus
+
+pytestmark = pytest.mark.anyio
+
+
+def heartbeat(self_id: int) -> HeartbeatEvent:
+    return HeartbeatEvent(time=1746673666, self_id=self_id, status=HeartbeatStatus(online=True, good=True), interval=30000)
+
+
+class TestShardedEventQueue:
+    async def test_round_robin_between_shards(self):
+        queue: ShardedEventQueue[str] = ShardedEventQueue()
+        for i in range(3):
+            await queue.put(f"a{i}", 1)
+        await queue.put("b0", 2)
+        await queue.put("c0", 3)
+        assert [await queue.get() for _ in range(5)] == ["a0", "b0", "c0", "a1", "a2"]
+        assert queue.empty()
+
+    async def test_drop_oldest(self):
+        queue: ShardedEventQueue[int] = ShardedEventQueue(2, 'drop_oldest')
+        for i in range(4):
+            await queue.put(i, 1)
+        await queue.put(10, 2)
+        assert queue.qsize(1) == 2
+        assert queue.dropped[1] == 2
+        assert [await queue.get() for _ in range(3)] == [2, 10, 3]
+
+    async def test_drop_meta_first(self):
+        queue: ShardedEventQueue[object] = ShardedEventQueue(2, 'drop_meta')
+        beat = heartbeat(1)
+        await queue.put(beat, 1)
+        await queue.put("m0", 1)
+        # 普通事件挤掉队列里的心跳
+        assert await queue.put("m1", 1)
+        # 队列里只剩普通事件时，新来的心跳直接丢弃
+        assert not await queue.put(heartbeat(1), 1)
+        assert queue.dropped[1] == 2
+        assert [await queue.get() for _ in range(2)] == ["m0", "m1"]
+
+    async def test_block_until_space(self):
+        queue: ShardedEventQueue[int] = ShardedEventQueue(1, 'block')
+        await queue.put(0, 1)
+        done = anyio.Event()
+
+        async def producer():
+            await queue.put(1, 1)
+            done.set()
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(producer)
+            await anyio.sleep(0.01)
+            assert not done.is_set()
+            assert await queue.get() == 0
+            await done.wait()
+        assert await queue.get() == 1
@@ -0,0 +1,50 @@
+from typing import Any
+from loguru import logger
+from app.core.hotlog import HotLogger
+
+
+class Probe:
+    """repr 被调用时计数，用来确认格式化是否延迟"""
+    def __init__(self):
+        self.calls = 0
+
+    def __repr__(self) -> str:
+        self.calls += 1
+        return "probe"
+
+
+def capture() -> tuple[list[dict[str, Any]], int]:
+    records: list[dict[str, Any]] = []
+    sink_id = logger.add(lambda m: records.append(m.record), level="TRACE")  # type: ignore
+    return records, sink_id
+
+
+class TestHotLogger:
+    def test_level_filter_is_lazy(self):
+        log = HotLogger("tests.hotlog")
+        log.set_level("INFO")
+        probe = Probe()
+        records, sink_id = capture()
+        try:
+            log.debug("event {!r}", probe)
+            assert probe.calls == 0
+            log.info("event {!r}", probe, bot_id=1)
+        finally:
+            logger.remove(sink_id)
+        assert probe.calls == 1
+        assert [r["message"] for r in records] == ["event probe"]
+        assert records[0]["extra"]["bot_id"] == 1
+        # 日志位置指向调用方而不是 HotLogger 内部
+        assert records[0]["function"] == "test_level_filter_is_lazy"
+
+    def test_sampling(self):
+        log = HotLogger("tests.hotlog")
+        log.set_level("DEBUG")
+        records, sink_id = capture()
+        try:
+            for i in range(5):
+                log.warning("flood {}", i, sample=3600)
+        finally:
+            logger.remove(sink_id)
+        assert [r["message"] for r in records] == ["flood 0"]
+        assert log._suppressed["flood {}"] == 4
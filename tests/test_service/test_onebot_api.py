@@ -0,0 +1,73 @@
+import time
+import pytest
+from app.onebot import api
+from app.onebot.api import get_login_info, get_group_member_info, get_group_member_list, invalidate_on_connect, invalidate_on_new_member
+from app.onebot.cache import TTLCache
+from app.schemas.qq import ConnectEvent, GroupMessage
+from tests.test_service.fake_bot import FakeBot
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch: pytest.MonkeyPatch) -> TTLCache:
+    cache = TTLCache(maxsize=2, ttl=60)
+    monkeypatch.setattr(api, "cache", cache)
+    monkeypatch.setattr(api, "_member_ids", {})
+    return cache
+
+
+class TestTTLCache:
+    def test_lru_eviction_and_stats(self, fresh_cache: TTLCache):
+        fresh_cache.set(1, ("a", 1), "x")
+        fresh_cache.set(1, ("a", 2), "y")
+        assert fresh_cache.get(1, ("a", 1)) == "x"
+        fresh_cache.set(1, ("a", 3), "z")
+        # ("a", 2) 最久未使用，被淘汰
+        assert fresh_cache.get(1, ("a", 2)) is None
+        assert fresh_cache.get(2, ("a", 1)) is None
+        stats = fresh_cache.stats["a"]
+        assert (stats.hits, stats.misses, stats.evictions) == (1, 2, 1)
+
+    def test_expiry(self, fresh_cache: TTLCache, monkeypatch: pytest.MonkeyPatch):
+        fresh_cache.set(1, ("a", 1), "x", ttl=10)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+        assert fresh_cache.get(1, ("a", 1)) is None
+        assert fresh_cache.stats["a"].invalidations == 1
+
+
+class TestCachedQueries:
+    async def test_repeated_query_hits_cache(self, fake_bot: FakeBot, fresh_cache: TTLCache):
+        for _ in range(3):
+            response = await get_group_member_info(1, group_id=10, user_id=20)
+            assert response is not None
+        assert len(fake_bot.frames) == 1
+        assert fresh_cache.stats["get_group_member_info"].hits == 2
+
+        await get_group_member_info(1, group_id=10, user_id=20, no_cache=True)
+        assert len(fake_bot.frames) == 2
+        assert fake_bot.frames[-1]["params"]["no_cache"] is True
+
+    async def test_connect_event_invalidates(self, fake_bot: FakeBot):
+        await get_login_info(1)
+        await invalidate_on_connect(ConnectEvent(time=1746673610, self_id=1))
+        await get_login_info(1)
+        assert len(fake_bot.frames) == 2
+
+    async def test_new_group_member_invalidates_list(self, fake_bot: FakeBot):
+        fake_bot.data["get_group_member_list"] = [{"user_id": 20}]
+        await get_group_member_list(1, group_id=10)
+
+        def message(user_id: int) -> GroupMessage:
+            return GroupMessage(
+                time=1746673610, self_id=1, user_id=user_id, message_id=1,
+                raw_message="", message=[], message_format="array", group_id=10
+            )
+
+        await invalidate_on_new_member(message(20))
+        await get_group_member_list(1, group_id=10)
+        assert len(fake_bot.frames) == 1
+        await invalidate_on_new_member(message(30))
+        await get_group_member_list(1, group_id=10)
+        assert len(fake_bot.frames) == 2
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from app.core.rate_limiter import RateLimiter, budget_of
+
+pytestmark = pytest.mark.anyio
+
+
+def test_budget_of():
+    assert budget_of("get_group_member_info") == "query"
+    assert budget_of("can_send_image") == "query"
+    assert budget_of("send_private_msg") == "send"
+
+
+class TestRateLimiter:
+    async def test_burst_then_throttle(self):
+        limiter = RateLimiter(send_rate=50, send_burst=2)
+        assert limiter.try_acquire(1, "send_private_msg")
+        assert limiter.try_acquire(1, "send_private_msg")
+        assert not limiter.try_acquire(1, "send_private_msg")
+        # 其他 bot 与查询配额互不影响
+        assert limiter.try_acquire(2, "send_private_msg")
+        assert limiter.try_acquire(1, "get_login_info")
+
+        wait = await limiter.acquire(1, "send_private_msg")
+        assert 0 < wait < 1
+        stats = limiter.stats[("send", "interactive")]
+        assert stats.acquired == 4
+        assert stats.max_wait == pytest.approx(wait)
+
+    async def test_interactive_goes_before_bulk(self):
+        limiter = RateLimiter(send_rate=100, send_burst=1)
+        assert limiter.try_acquire(1, "send_private_msg")
+        order: list[str] = []
+
+        async def acquire(name: str, priority):
+            await limiter.acquire(1, "send_private_msg", priority)
+            order.append(name)
+
+        bulk = [asyncio.create_task(acquire(f"bulk{i}", "bulk")) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(acquire("interactive", "interactive"))
+        await asyncio.wait_for(asyncio.gather(*bulk, interactive), 1)
+        assert order[0] == "interactive"
+        assert limiter.queued(1) == {"send": 0, "query": 0}
+
+    async def test_cancelled_waiter_is_skipped(self):
+        limiter = RateLimiter(send_rate=100, send_burst=1)
+        assert limiter.try_acquire(1, "send_private_msg")
+        cancelled = asyncio.create_task(limiter.acquire(1, "send_private_msg"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.wait_for(limiter.acquire(1, "send_private_msg"), 1)
+        assert limiter.stats[("send", "interactive")].acquired == 2
+
+    async def test_acquire_timeout_keeps_token(self):
+        limiter = RateLimiter(send_rate=5, send_burst=1)
+        assert limiter.try_acquire(1, "send_private_msg")
+        assert await limiter.acquire(1, "send_private_msg", timeout=0.01) is None
+        assert limiter.queued(1)["send"] == 0
+        # 归还的令牌可以立即被使用
+        limiter.release(1, "send_private_msg")
+        assert limiter.try_acquire(1, "send_private_msg")
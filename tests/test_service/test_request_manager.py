@@ -0,0 +1,204 @@
+import asyncio
+import pytest
+from app.core import request_manager
+from app.core.request_manager import send_request, send_requests_many, generate_echo
+from tests.test_service.fake_bot import FakeBot
+from app.core.rate_limiter import RateLimiter
+from app.api.v1.ws import BotConnection
+from app.schemas.qq import ConnectEvent
+
+pytestmark = pytest.mark.anyio
+
+
+class TestSendRequest:
+    async def test_single_request(self, fake_bot: FakeBot):
+        response = await send_request(1, "get_login_info", {})
+        assert response is not None
+        assert response.data == {"action": "get_login_info"}
+        assert not request_manager.pending_requests
+
+    async def test_timeout(self, fake_bot: FakeBot):
+        before = request_manager.get_timeout_counts().get("never_reply", 0)
+        assert await send_request(1, "never_reply", {}, timeout=0.05) is None
+        assert not request_manager.pending_requests
+        assert request_manager.get_timeout_counts()["never_reply"] == before + 1
+
+    async def test_earlier_deadline_reschedules(self, fake_bot: FakeBot):
+        # 后发出但超时更短的请求不应等待先前更长的截止时间
+        slow = asyncio.create_task(send_request(1, "never_reply", {}, timeout=5))
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        assert await send_request(1, "never_reply", {}, timeout=0.05) is None
+        assert loop.time() - start < 1
+        slow.cancel()
+
+    async def test_unwritten_frame_bounded_by_timeout(self, monkeypatch: pytest.MonkeyPatch):
+        # 真实的 send_message 只入队；写出协程没有运行时帧一直留在发送队列里
+        connection = BotConnection(1, None, 16)  # type: ignore
+        monkeypatch.setattr(request_manager.manager, "active_connections", {1: connection})
+        monkeypatch.setattr(request_manager, "limiter", RateLimiter())
+        assert await asyncio.wait_for(send_request(1, "get_status", {}, timeout=0.05), 1) is None
+        assert len(connection.outbox) == 1
+        assert not request_manager.pending_requests
+
+    async def test_completed_entries_are_compacted(self, fake_bot: FakeBot):
+        for _ in range(request_manager._TimeoutHeap.COMPACT_MIN + 10):
+            assert await send_request(1, "get_status", {}, timeout=30) is not None
+        assert len(request_manager._timeouts._heap) < request_manager._TimeoutHeap.COMPACT_MIN
+
+    async def test_unencodable_params_leave_nothing_behind(self, fake_bot: FakeBot):
+        heap = list(request_manager._timeouts._heap)
+        with pytest.raises(Exception):
+            await send_request(1, "send_private_msg", {"message": object()})
+        with pytest.raises(Exception):
+            await send_requests_many(1, [("get_login_info", {}), ("send_private_msg", {"message": object()})])
+        assert not request_manager.pending_requests
+        assert request_manager._timeouts._heap == heap
+        assert not fake_bot.frames
+
+
+class TestEcho:
+    def test_counter_per_bot_and_wrap(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(request_manager, "_echo_counters", {})
+        monkeypatch.setattr(request_manager, "pending_requests", {})
+        assert [generate_echo(1) for _ in range(3)] == ["1", "2", "3"]
+        assert generate_echo(2) == "1"
+
+        # 计数回绕后跳过仍在等待响应的 echo
+        request_manager._echo_counters[1] = request_manager.ECHO_SPACE - 1
+        request_manager.pending_requests[1] = dict.fromkeys(["0", "1"])  # type: ignore
+        assert generate_echo(1) == "2"
+
+
+class TestSendRequestsMany:
+    async def test_batch_with_partial_results(self, fake_bot: FakeBot):
+        requests = [
+            ("get_group_member_info", {"group_id": 1, "user_id": 1}),
+            ("never_reply", {}),
+            ("get_group_member_info", {"group_id": 1, "user_id": 2}),
+        ]
+        responses = await send_requests_many(1, requests, timeout=0.05)
+        assert [frame["action"] for frame in fake_bot.frames] == [action for action, _ in requests]
+        assert responses[0] is not None and responses[0].data == {"action": "get_group_member_info"}
+        assert responses[1] is None
+        assert responses[2] is not None
+        assert not request_manager.pending_requests
+
+
+class TestSingleFlight:
+    async def test_identical_requests_share_one_frame(self, fake_bot: FakeBot, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(request_manager, "single_flight_actions", {"get_group_member_info"})
+        before = request_manager.single_flight_counts["get_group_member_info"]
+        responses = await asyncio.gather(
+            *(send_request(1, "get_group_member_info", {"group_id": 1, "user_id": 2}) for _ in range(5)),
+            send_request(1, "get_group_member_info", {"user_id": 3, "group_id": 1}),
+        )
+        assert len(fake_bot.frames) == 2
+        assert all(response is responses[0] for response in responses[:5])
+        assert responses[5] is not None
+        assert request_manager.single_flight_counts["get_group_member_info"] == before + 4
+        assert not request_manager._in_flight
+
+    async def test_not_enabled_actions_are_not_merged(self, fake_bot: FakeBot):
+        await asyncio.gather(*(send_request(1, "send_private_msg", {"user_id": 1, "message": []}) for _ in range(3)))
+        assert len(fake_bot.frames) == 3
+
+
+class TestDisconnect:
+    async def test_pending_fail_on_disconnect(self, fake_bot: FakeBot):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        task = asyncio.create_task(send_request(1, "never_reply", {}, timeout=5))
+        await asyncio.sleep(0)
+        request_manager._fail_pending(1)
+        assert await task is None
+        assert loop.time() - start < 1
+        assert not request_manager.pending_requests
+
+    async def test_request_raises_bot_disconnected(self, fake_bot: FakeBot):
+        task = asyncio.create_task(request_manager.request(1, "never_reply", {}, timeout=5))
+        await asyncio.sleep(0)
+        request_manager._fail_pending(1)
+        with pytest.raises(request_manager.BotDisconnected):
+            await task
+
+    async def test_reissue_after_reconnect(self, fake_bot: FakeBot):
+        fake_bot.silent_actions.add("get_status")
+        task = asyncio.create_task(send_request(1, "get_status", {}, timeout=5, reissue=True))
+        await asyncio.sleep(0)
+        request_manager._fail_pending(1)
+        await asyncio.sleep(0)
+        assert not task.done()
+
+        fake_bot.silent_actions.discard("get_status")
+        request_manager._notify_reconnect(1)
+        response = await asyncio.wait_for(task, 1)
+        assert response is not None and response.data == {"action": "get_status"}
+        assert len(fake_bot.frames) == 2
+        assert fake_bot.frames[0]["echo"] != fake_bot.frames[1]["echo"]
+
+    async def test_reissue_gives_up_at_deadline(self, fake_bot: FakeBot):
+        task = asyncio.create_task(send_request(1, "never_reply", {}, timeout=0.05, reissue=True))
+        await asyncio.sleep(0)
+        request_manager._fail_pending(1)
+        assert await asyncio.wait_for(task, 1) is None
+        assert not request_manager._reconnect_waiters
+
+    async def test_reissue_through_connection_manager(self, fake_bot: FakeBot, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(request_manager.manager, "active_connections", {})
+        monkeypatch.setattr(request_manager.manager, "health", {})
+        assert await request_manager.manager.connect(ReconnectingWebSocket(1))  # type: ignore
+        fake_bot.silent_actions.add("get_status")
+        task = asyncio.create_task(send_request(1, "get_status", {}, timeout=5, reissue=True))
+        await asyncio.sleep(0)
+
+        # 断开与重连在请求任务再次运行前就已完成，重发不能等到截止时间
+        fake_bot.silent_actions.discard("get_status")
+        await request_manager.manager.disconnect(1)
+        assert await request_manager.manager.connect(ReconnectingWebSocket(1))  # type: ignore
+        response = await asyncio.wait_for(task, 1)
+        assert response is not None and response.data == {"action": "get_status"}
+        assert len(fake_bot.frames) == 2
+        assert not request_manager._reconnect_waiters
+
+
+class ReconnectingWebSocket:
+    """只完成握手的假连接"""
+
+    def __init__(self, bot_id: int):
+        self.bot_id = bot_id
+        self.headers = {"x-self-id": str(bot_id)}
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        return {"type": "websocket.receive", "text": ConnectEvent(time=1746673610, self_id=self.bot_id).model_dump_json()}
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class TestRateLimited:
+    async def test_timeout_bounds_limiter_wait(self, fake_bot: FakeBot, monkeypatch: pytest.MonkeyPatch):
+        limiter = RateLimiter(send_rate=1, send_burst=1)
+        monkeypatch.setattr(request_manager, "limiter", limiter)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*(send_request(1, "never_reply", {}, timeout=0.2) for _ in range(4)))
+        assert results == [None] * 4
+        # 超时的请求不会继续在限流器中排队，也不会发出
+        assert loop.time() - start < 0.5
+        assert len(fake_bot.frames) == 1
+
+    async def test_full_outbox_returns_tokens(self, monkeypatch: pytest.MonkeyPatch):
+        limiter = RateLimiter(send_rate=0.01, send_burst=4)
+        monkeypatch.setattr(request_manager, "limiter", limiter)
+        connection = BotConnection(1, None, high_water=2)  # type: ignore
+        monkeypatch.setattr(request_manager.manager, "active_connections", {1: connection})
+        results = await send_requests_many(1, [("send_msg", {"n": i}) for i in range(4)], timeout=0.05)
+        assert results == [None] * 4
+        assert len(connection.outbox) == 2
+        # 没能入队的两帧归还了令牌
+        assert [limiter.try_acquire(1, "send_msg") for _ in range(3)] == [True, True, False]
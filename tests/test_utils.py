@@ -5,7 +5,7 @@ from typing import (
     Any,
     TypeVar
 )
-from app.core.utils import enhanced_isinstance
+from app.core.utils import enhanced_isinstance, compile_type_checker, union_classes
 from app.schemas.qq import (
     WsMessage,
     PrivateMessage,
@@ -398,5 +398,26 @@ def test_wsmessage_types():
     assert enhanced_isinstance(type_mapping, dict[str, type[WsMessage]])
 
 
+def test_compile_type_checker():
+    """测试编译后的类型检查闭包"""
+    hint = dict[str, list[int | Annotated[str, "x"]] | None]
+    check = compile_type_checker(hint)
+    # 同一类型提示命中缓存，返回同一个闭包
+    assert compile_type_checker(hint) is check
+    assert check({"a": [1, "b"], "b": None})
+    assert not check({"a": [1.0]})
+
+    # 嵌套的 Union/Annotated 与 type[X] 在编译后语义不变
+    assert compile_type_checker(Annotated[int | Annotated[str | None, "y"], "z"])(None)
+    assert compile_type_checker(type[int | str])(bool)
+    assert not compile_type_checker(type[int | str])(float)
+
+
+def test_union_classes():
+    """测试联合类型展开为具体类"""
+    assert union_classes(int) == (int,)
+    assert union_classes(Annotated[int | Annotated[str | int, "y"], "z"] | list[int] | None) == (int, str, type(None))
+
+
 if __name__ == '__main__':
     pytest.main([__file__])